@@ -1,36 +1,89 @@
 import io
-from typing import Iterable, Iterator, Tuple
+from typing import Any, Iterable, Iterator, Optional, Sequence, Tuple
 import warnings
-import concurrent.futures
 from functools import partial
 
 import click
 
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore")
-    import pydub
+from .executors import ExecutorConfig
+from .memory import MIB, UNLIMITED, MemoryBudget
+from .schedule import CostModel, Measurement, map_longest_first, timed
 
+# decoded PCM held by a worker while converting a single sample
+CONVERT_TASK_SIZE = 32 * MIB
 
-def convert_sound(src_ext: str, target_ext: str, snd_data: bytes) -> bytes:
-    if src_ext == target_ext:
-        return snd_data
-    with io.BytesIO(snd_data) as in_snd:
-        snd = pydub.AudioSegment.from_file(in_snd, format=src_ext)
-    with io.BytesIO() as out_snd:
-        snd.export(out_snd, format=target_ext)
-        return out_snd.getvalue()
+_pydub: Any = None
+
+
+def import_pydub():
+    # catch_warnings swaps process-wide filters and is not thread-safe,
+    # so module is imported once, by parent before starting workers
+    global _pydub
+    if _pydub is None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            import pydub
+        _pydub = pydub
+    return _pydub
+
+
+def convert_sound(
+    src_ext: str, target_exts: Sequence[str], snd_data: bytes
+) -> Tuple[bytes, ...]:
+    """Decode sample once and encode it to each of target formats"""
+    snd = None
+    converted = []
+    for target_ext in target_exts:
+        if target_ext == src_ext:
+            converted.append(snd_data)
+            continue
+        if snd is None:
+            pydub = import_pydub()
+            with io.BytesIO(snd_data) as in_snd:
+                snd = pydub.AudioSegment.from_file(in_snd, format=src_ext)
+        with io.BytesIO() as out_snd:
+            snd.export(out_snd, format=target_ext)
+            converted.append(out_snd.getvalue())
+    return tuple(converted)
+
+
+def convert_entry(
+    src_ext: str, target_exts: Sequence[str], entry: Tuple[bytes, bytes, bytes]
+) -> Tuple[Tuple[bytes, bytes, Tuple[bytes, ...]], Measurement]:
+    offset, tags, snd_data = entry
+    converted, elapsed = timed(convert_sound, src_ext, target_exts, snd_data)
+    stage = f'audio:{"+".join(target_exts)}'
+    return (offset, tags, converted), Measurement(stage, len(snd_data), elapsed)
 
 
 def convert_streams(
-    streams: Iterable[Tuple[bytes, bytes, bytes]], src_ext: str, target_ext: str
-) -> Iterator[Tuple[bytes, bytes, bytes]]:
-    offs, tags_info, sounds = zip(*streams)
-    convert = partial(convert_sound, src_ext, target_ext)
+    streams: Iterable[Tuple[bytes, bytes, bytes]],
+    src_ext: str,
+    target_exts: Sequence[str],
+    budget: MemoryBudget = UNLIMITED,
+    executors: Optional[ExecutorConfig] = None,
+) -> Iterator[Tuple[bytes, bytes, Tuple[bytes, ...]]]:
+    convert = partial(convert_entry, src_ext, tuple(target_exts))
+    executors = executors or ExecutorConfig()
+    workers = budget.workers(CONVERT_TASK_SIZE, executors.jobs_for('audio'))
+    model = CostModel.load()
+    import_pydub()
 
-    with concurrent.futures.ProcessPoolExecutor() as executor:
+    with executors.create('audio', workers) as executor:
         try:
-            converted = executor.map(convert, sounds)
-            yield from zip(offs, tags_info, converted)
+            # longest samples of each window are submitted first,
+            # so a long one does not end up last on a single worker
+            converted = map_longest_first(
+                executor,
+                convert,
+                streams,
+                window=budget.window(workers),
+                size=lambda entry: len(entry[2]),
+            )
+            for entry, measurement in converted:
+                model.record([measurement])
+                yield entry
+            model.save()
         except KeyboardInterrupt as kbi:
             executor.shutdown(wait=False)
             raise kbi
@@ -45,6 +98,7 @@ class LibraryFFMPEGNotAvailableError(click.ClickException):
 
 
 def test_converter(target_ext: str) -> None:
+    pydub = import_pydub()
     try:
         with io.BytesIO() as stream:
             pydub.AudioSegment.empty().export(stream, format=target_ext)
@@ -53,9 +107,19 @@ def test_converter(target_ext: str) -> None:
 
 
 def format_streams(
-    streams: Iterable[Tuple[bytes, bytes, bytes]], src_ext: str, target_ext: str
-):
-    if src_ext == target_ext:
-        return streams
-    test_converter(target_ext)
-    return convert_streams(streams, src_ext, target_ext)
+    streams: Iterable[Tuple[bytes, bytes, Any]],
+    src_ext: str,
+    target_exts: Sequence[str],
+    budget: MemoryBudget = UNLIMITED,
+    executors: Optional[ExecutorConfig] = None,
+) -> Iterator[Tuple[bytes, bytes, Tuple[Any, ...]]]:
+    """Yield each stream formatted to every target format, in given order"""
+    if set(target_exts) == {src_ext}:
+        return (
+            (offset, tags, (stream,) * len(target_exts))
+            for offset, tags, stream in streams
+        )
+    for target_ext in target_exts:
+        if target_ext != src_ext:
+            test_converter(target_ext)
+    return convert_streams(streams, src_ext, target_exts, budget, executors)
@@ -1,38 +1,44 @@
 import concurrent.futures
+import contextlib
 import functools
 import io
 import itertools
 import os
 import subprocess
 import sys
+import threading
 from struct import Struct
-from contextlib import contextmanager
-from typing import Iterable
-
-from nutcracker.compress_san import strip_compress_san
-from nutcracker.smush.preset import smush
+from typing import IO, Callable, Dict, Iterable, List, Mapping, Optional, cast
 
 from . import lpak
+from .executors import ExecutorConfig, InlineFuture
+from .memory import UNLIMITED, MemoryBudget
 from .missing import closed_tempfile_name
+from .progress import (
+    ProgressChannel,
+    init_progress,
+    task_progress,
+    watch_progress,
+    weighted_progress,
+)
+from .san import FRAME_BATCH_SIZE, MapBatches, compress_san, get_frame_offsets
+from .schedule import CostModel, Measurement, longest_first, timed
+from .utils import bounded_map, consume, copy_stream_buffered
 
 
 UINT32LE = Struct('<I')
-G_PAK = None
-
-
-@contextmanager
-def suppress_stdout():
-    with open(os.devnull, "w") as devnull:
-        old_stdout = sys.stdout
-        sys.stdout = devnull
-        try:
-            yield
-        finally:
-            sys.stdout = old_stdout
-
-
-def extract_ogv_audio(source: bytes, dest: str) -> None:
-    with closed_tempfile_name(content=source, mode='w+b', suffix='.ogv') as src:
+STAGES = ('san', 'ogv')
+G_WORKER = threading.local()
+# archives opened by worker threads of this process, closed when stages are done
+G_ARCHIVES: List[lpak.LPakArchive] = []
+
+
+def extract_ogv_audio(
+    source: IO[bytes], dest: str, buffer_size: int = io.DEFAULT_BUFFER_SIZE
+) -> None:
+    with closed_tempfile_name(mode='w+b', suffix='.ogv') as src:
+        with open(src, 'wb') as tmp:
+            consume(copy_stream_buffered(source, tmp, buffer_size))
         try:
             _ = subprocess.run(
                 # # Direct extract of audio stream is disabled until supported
@@ -72,14 +78,8 @@ def extract_ogv_audio(source: bytes, dest: str) -> None:
             sys.exit(1)
 
 
-def get_smush_offsets(res):
-    with io.BytesIO(res) as stream:
-        anim = smush.assert_tag('ANIM', smush.untag(stream))
-        assert stream.read() == b''
-
-    _, *frames = smush.read_chunks(anim)
-    for (offset, _) in frames:
-        yield offset + 8
+def pack_offsets(offsets: Iterable[int]) -> bytes:
+    return b''.join(UINT32LE.pack(offset) for offset in offsets)
 
 
 def get_base_size(pak: lpak.LPakArchive, fname: str):
@@ -96,89 +96,312 @@ def get_base_size(pak: lpak.LPakArchive, fname: str):
     )
 
 
-def compress_single(pak: lpak.LPakArchive, fname: str, output_dir: str = '.'):
+def find_videohd(pak: lpak.LPakArchive, fname: str) -> Optional[str]:
+    simplename, ext = os.path.splitext(os.path.basename(fname))
+    videohd = os.path.join('videohd', f'{simplename}.ogv')
+    return videohd if videohd in pak.index else None
+
+
+def find_hd_videos(pak: lpak.LPakArchive, files: Iterable[str]) -> Dict[str, str]:
+    """HD video of each SAN file, files without one are left out"""
+    videos = {fname: find_videohd(pak, fname) for fname in files}
+    return {fname: videohd for fname, videohd in videos.items() if videohd}
+
+
+def get_stage_sizes(
+    pak: lpak.LPakArchive, hd_videos: Mapping[str, str]
+) -> Dict[str, int]:
+    return {
+        'san': sum(pak.index[fname].decompressed_size for fname in hd_videos),
+        'ogv': sum(
+            pak.index[videohd].decompressed_size for videohd in hd_videos.values()
+        ),
+    }
+
+
+def get_stage_weights(model: CostModel) -> Dict[str, float]:
+    return {stage: model.rate(stage) for stage in STAGES}
+
+
+def estimate_costs(
+    pak: lpak.LPakArchive, fname: str, videohd: Optional[str], model: CostModel
+):
+    """Estimated seconds for SAN compression and audio extraction of video"""
+    if not videohd:
+        return 0.0, 0.0
+    return (
+        model.estimate('san', pak.index[fname].decompressed_size),
+        model.estimate('ogv', pak.index[videohd].decompressed_size),
+    )
+
+
+def get_output_directory(fname: str, output_dir: str = '.'):
+    directory = os.path.join(output_dir, os.path.basename(os.path.dirname(fname)))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def compress_video(
+    pak: lpak.LPakArchive,
+    fname: str,
+    output_dir: str = '.',
+    map_batches: MapBatches = map,
+    report: Optional[Callable[[int], None]] = None,
+):
     basename = os.path.basename(fname)
     simplename, ext = os.path.splitext(basename)
 
-    videohd = next(pak.iglob(os.path.join('videohd', f'{simplename}.ogv')), None)
-    if videohd:
-        # override SAN file with compressed version
-        with pak.open(fname, 'rb') as res, suppress_stdout():
-            data = strip_compress_san(res)
-
-        directory = os.path.join(output_dir, os.path.basename(os.path.dirname(fname)))
-        os.makedirs(directory, exist_ok=True)
-        with open(os.path.join(directory, basename), 'wb') as out:
-            out.write(data)
-
-        flubase = f'{simplename}.flu'
-        flufile = next(
-            pak.iglob(os.path.join(os.path.dirname(fname), flubase)),
-            None,
+    flubase = f'{simplename}.flu'
+    flufile = next(
+        pak.iglob(os.path.join(os.path.dirname(fname), flubase)),
+        None,
+    )
+    if flufile:
+        with pak.open(flufile, 'rb') as res:
+            flu = res.read(0x324)
+            flurest = res.read()
+
+        # only chunk headers are read to verify
+        with pak.open(fname, 'rb') as res:
+            res = cast(IO[bytes], res)
+            assert flurest == pack_offsets(get_frame_offsets(res))
+
+    # override SAN file with compressed version
+    directory = get_output_directory(fname, output_dir)
+    output_file = os.path.join(directory, basename)
+    with pak.open(fname, 'rb') as res, open(output_file, 'wb') as out:
+        res = cast(IO[bytes], res)
+        offsets = compress_san(res, out, map_batches, report=report)
+
+    if flufile:
+        with open(output_file, 'rb') as res:
+            assert offsets == list(get_frame_offsets(res))
+        with open(os.path.join(directory, flubase), 'wb') as out:
+            out.write(flu)
+            out.write(pack_offsets(offsets))
+
+
+def extract_audio(
+    pak: lpak.LPakArchive,
+    fname: str,
+    videohd: str,
+    output_dir: str = '.',
+    buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+):
+    simplename, ext = os.path.splitext(os.path.basename(fname))
+    directory = get_output_directory(fname, output_dir)
+
+    # extract audio stream from HD video
+    with pak.open(videohd, 'rb') as vid:
+        vid = cast(IO[bytes], vid)
+        extract_ogv_audio(
+            vid, os.path.join(directory, f'{simplename}.ogg'), buffer_size
         )
-        if flufile:
-            with pak.open(flufile, 'rb') as res:
-                flu = res.read(0x324)
-                flurest = res.read()
-
-            with pak.open(fname, 'rb') as res:
-                raw_content = res.read()
-            assert flurest == b''.join(
-                UINT32LE.pack(offset) for offset in get_smush_offsets(raw_content)
-            )
 
-            with open(os.path.join(directory, flubase), 'wb') as out:
-                out.write(flu)
-                out.write(
-                    b''.join(
-                        UINT32LE.pack(offset) for offset in get_smush_offsets(data)
-                    )
-                )
 
-        # extract audio stream from HD video
-        with pak.open(videohd, 'rb') as vid:
-            stream = vid.read()
-        extract_ogv_audio(stream, os.path.join(directory, f'{simplename}.ogg'))
-    return get_base_size(pak, fname)
+def init_worker(archive_name: str, channel: Optional[ProgressChannel] = None):
+    # thread backends run initializer in each thread,
+    # so workers never share reading position in archive,
+    # a thread running tasks of both stages keeps its archive
+    pak = getattr(G_WORKER, 'pak', None)
+    if pak is None or pak not in G_ARCHIVES or pak.path != archive_name:
+        G_WORKER.pak = lpak.LPakArchive(archive_name)
+        G_ARCHIVES.append(G_WORKER.pak)
+    init_progress(channel)
+
+
+def close_worker_archives() -> None:
+    while G_ARCHIVES:
+        G_ARCHIVES.pop().close()
+
+
+def get_worker_archive() -> lpak.LPakArchive:
+    pak = getattr(G_WORKER, 'pak', None)
+    assert pak is not None
+    return pak
+
+
+def compress_worker(fname: str, output_dir: str = '.'):
+    pak = get_worker_archive()
+    size = pak.index[fname].decompressed_size
+    with task_progress('san', size) as report:
+        _, elapsed = timed(compress_video, pak, fname, output_dir, map, report)
+    return [Measurement('san', size, elapsed)]
 
 
-def init_worker(archive_name: str):
-    global G_PAK
-    G_PAK = lpak.LPakArchive(archive_name)
+def extract_audio_worker(
+    fname: str,
+    videohd: str,
+    output_dir: str = '.',
+    buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+):
+    pak = get_worker_archive()
+    size = pak.index[videohd].decompressed_size
+    # ffmpeg does not report input position, so progress moves when done
+    with task_progress('ogv', size):
+        _, elapsed = timed(
+            extract_audio, pak, fname, videohd, output_dir, buffer_size
+        )
+    return [Measurement('ogv', size, elapsed)]
 
 
-def convert_worker(fname: str, output_dir: str = '.'):
-    global G_PAK
-    assert G_PAK is not None
-    return compress_single(G_PAK, fname, output_dir)
+def compress_long_videos(
+    pak: lpak.LPakArchive,
+    files: Iterable[str],
+    output_dir: str,
+    map_batches: MapBatches,
+):
+    for fname in files:
+        with task_progress('san', pak.index[fname].decompressed_size) as report:
+            compress_video(pak, fname, output_dir, map_batches, report)
+    # not measured, wall time of parallel batches is not a per-byte rate
+    return []
+
+
+def is_long_video(cost: float, total_cost: float, size: int, workers: int) -> bool:
+    # a video that would keep a single worker busy longer than its share
+    return cost > total_cost / workers and size > 2 * FRAME_BATCH_SIZE
 
 
 def compress_and_convert_cutscenes(
-    pak: lpak.LPakArchive, files: Iterable[str] = (), output_dir: str = '.'
+    pak: lpak.LPakArchive,
+    files: Iterable[str] = (),
+    output_dir: str = '.',
+    budget: MemoryBudget = UNLIMITED,
+    model: Optional[CostModel] = None,
+    executors: Optional[ExecutorConfig] = None,
 ):
-    worker = functools.partial(convert_worker, output_dir=output_dir)
-    with concurrent.futures.ProcessPoolExecutor(
-        initializer=init_worker, initargs=(pak.path,)
-    ) as executor:
+    """Convert cutscenes, yielding progress in units of estimated cost
+    of processed bytes"""
+    model = model or CostModel.load()
+    executors = executors or ExecutorConfig()
+    hd_videos = find_hd_videos(pak, pak.sort_by_offset(files))
+    costs = {
+        fname: estimate_costs(pak, fname, videohd, model)
+        for fname, videohd in hd_videos.items()
+    }
+    files = longest_first(
+        hd_videos,
+        lambda fname: sum(costs[fname]),
+    )
+    sizes = {fname: pak.index[fname].decompressed_size for fname in files}
+    total_cost = sum(sum(cost) for cost in costs.values())
+    workers = executors.jobs_for('san')
+    long_files = [
+        fname
+        for fname in files
+        if is_long_video(costs[fname][0], total_cost, sizes[fname], workers)
+    ]
+    short_files = [fname for fname in files if fname not in long_files]
+
+    # videos are streamed through frame batches, each worker holds
+    # a batch of raw frames along with its compressed frames
+    task_size = 2 * FRAME_BATCH_SIZE
+    workers = budget.workers(task_size, workers) or workers
+    window = budget.window(workers)
+    if window is None:
+        window = 2 * workers * FRAME_BATCH_SIZE
+    ogv_workers = budget.workers(budget.buffer_size, executors.jobs_for('ogv'))
+
+    # one row of counters for each worker and for thread feeding long videos
+    channel = ProgressChannel(workers + (ogv_workers or 1) + 1, STAGES)
+    stage_sizes = get_stage_sizes(pak, hd_videos)
+
+    compress = functools.partial(compress_worker, output_dir=output_dir)
+    extract = functools.partial(
+        extract_audio_worker, output_dir=output_dir, buffer_size=budget.buffer_size
+    )
+    initargs = (pak.path, channel)
+    with contextlib.ExitStack() as stack:
+        stack.callback(close_worker_archives)
+        san_executor = stack.enter_context(
+            executors.create('san', workers, init_worker, initargs)
+        )
+        ogv_executor = stack.enter_context(
+            executors.create('ogv', ogv_workers, init_worker, initargs)
+        )
+        # long videos are read and written by parent, frames are compressed
+        # by SAN workers, while main thread keeps reporting progress
+        feeder = stack.enter_context(
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, initializer=init_progress, initargs=(channel,)
+            )
+        )
         try:
-            results = executor.map(worker, files)
-            yield from results
+            # submitted longest first, so each idle worker picks
+            # the most expensive video left (LPT scheduling)
+            pending = [san_executor.submit(compress, fname) for fname in short_files]
+            # audio extraction mostly reads, so videos are visited
+            # in order of their position in archive file
+            by_video = {videohd: fname for fname, videohd in hd_videos.items()}
+            pending.extend(
+                ogv_executor.submit(extract, by_video[videohd], videohd)
+                for videohd in pak.sort_by_offset(by_video)
+            )
+            # inline tasks run in thread asking for their result, so feeder
+            # runs them while main thread keeps reporting progress
+            pending = [
+                feeder.submit(future.result)
+                if isinstance(future, InlineFuture)
+                else future
+                for future in pending
+            ]
+
+            # frame batches are queued behind whole videos,
+            # and spread over workers as they become idle
+            map_batches = functools.partial(
+                bounded_map,
+                san_executor,
+                window=window,
+                size=lambda batch: sum(len(frame) for frame in batch),
+            )
+            pending.append(
+                feeder.submit(
+                    compress_long_videos, pak, long_files, output_dir, map_batches
+                )
+            )
+
+            yield from watch_progress(
+                channel,
+                pending,
+                lambda future: model.record(future.result()),
+                get_stage_weights(model),
+                stage_sizes,
+            )
+            model.save()
         except KeyboardInterrupt as kbi:
-            executor.shutdown(wait=False)
+            san_executor.shutdown(wait=False)
+            ogv_executor.shutdown(wait=False)
             raise kbi
 
 
-def convert_cutscenes(pak: lpak.LPakArchive, output_dir: str = '.'):
+def find_cutscenes(pak: lpak.LPakArchive):
     patterns = {'video/*.san', 'data/*.san'}
-    files = set(
+    return set(
         itertools.chain.from_iterable(pak.iglob(pattern) for pattern in patterns)
     )
+
+
+def convert_cutscenes(
+    pak: lpak.LPakArchive,
+    output_dir: str = '.',
+    budget: MemoryBudget = UNLIMITED,
+    executors: Optional[ExecutorConfig] = None,
+):
+    files = find_cutscenes(pak)
     if len(files) > 0:
         action = 'Converting cutscenes...'
-        total_size = sum(get_base_size(pak, fname) for fname in files)
+        model = CostModel.load()
+        # same units as progress of conversion, so it ends exactly on total
+        total_cost = weighted_progress(
+            get_stage_weights(model),
+            get_stage_sizes(pak, find_hd_videos(pak, files)),
+        )
         yield action, (
-            compress_and_convert_cutscenes(pak, files, output_dir),
-            total_size,
+            compress_and_convert_cutscenes(
+                pak, files, output_dir, budget, model, executors
+            ),
+            total_cost,
         )
 
 
@@ -0,0 +1,175 @@
+import concurrent.futures
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+BACKENDS = ('processes', 'threads', 'inline')
+
+# stages doing the work in python code are bound by GIL and need processes,
+# stages waiting on ffmpeg subprocesses do as well with threads,
+# which skip pickling of samples and startup of worker processes
+STAGE_BACKENDS = {
+    'audio': 'threads',  # pydub conversion, runs ffmpeg for each sample
+    'san': 'processes',  # SAN frames compression, pure python
+    'ogv': 'threads',  # audio extraction from HD video, runs ffmpeg
+}
+
+
+class InlineFuture(concurrent.futures.Future):
+    """Task of inline executor, run by the first thread asking for its result."""
+
+    def __init__(self, executor: 'InlineExecutor', fn, args, kwargs) -> None:
+        super().__init__()
+        self._executor = executor
+        self._task: Optional[Tuple[Callable[..., Any], Tuple, Dict]] = (
+            fn,
+            args,
+            kwargs,
+        )
+
+    def run(self) -> None:
+        with self._condition:
+            task, self._task = self._task, None
+        if task is None:
+            return
+        self._executor.forget(self)
+        if not self.set_running_or_notify_cancel():
+            return
+        fn, args, kwargs = task
+        try:
+            self._executor.initialize()
+            result = fn(*args, **kwargs)
+        except BaseException as exc:
+            self.set_exception(exc)
+        else:
+            self.set_result(result)
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        self.run()
+        return super().result(timeout)
+
+    def exception(self, timeout: Optional[float] = None) -> Optional[BaseException]:
+        self.run()
+        return super().exception(timeout)
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    """Run each task in the thread asking for its result, tasks nobody asked
+    for are run at shutdown. Initializer runs once in each of those threads."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+    ) -> None:
+        self._initializer = initializer
+        self._initargs = initargs
+        self._initialized = threading.local()
+        # insertion ordered, so tasks left at shutdown run in order of submit
+        self._pending: Dict[InlineFuture, None] = {}
+
+    def initialize(self) -> None:
+        if self._initializer is None or getattr(self._initialized, 'done', False):
+            return
+        self._initializer(*self._initargs)
+        self._initialized.done = True
+
+    def forget(self, future: InlineFuture) -> None:
+        self._pending.pop(future, None)
+
+    def submit(self, fn, *args, **kwargs):  # type: ignore
+        future = InlineFuture(self, fn, args, kwargs)
+        self._pending[future] = None
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        for future in list(self._pending):
+            if wait and not cancel_futures:
+                future.run()
+            else:
+                future.cancel()
+                self.forget(future)
+
+
+EXECUTOR_TYPES = {
+    'processes': concurrent.futures.ProcessPoolExecutor,
+    'threads': concurrent.futures.ThreadPoolExecutor,
+    'inline': InlineExecutor,
+}
+
+
+def parse_backend(text: str) -> Tuple[Optional[str], str, Optional[int]]:
+    """Parse `[STAGE=]BACKEND[:JOBS]` executor option."""
+    stage, _, spec = text.rpartition('=')
+    backend, _, jobs = spec.partition(':')
+    backend = backend.strip().lower()
+    stage = stage.strip().lower()
+    if stage and stage not in STAGE_BACKENDS:
+        available = '|'.join(STAGE_BACKENDS)
+        raise ValueError(f'unknown stage: {stage!r}, expected [{available}]')
+    if backend not in BACKENDS:
+        available = '|'.join(BACKENDS)
+        raise ValueError(f'unknown backend: {backend!r}, expected [{available}]')
+    if jobs and not (jobs.isdigit() and int(jobs) > 0):
+        raise ValueError(f'invalid number of jobs: {jobs!r}')
+    return stage or None, backend, int(jobs) if jobs else None
+
+
+class ExecutorConfig:
+    """Backend and number of workers of each stage, records what was used."""
+
+    def __init__(
+        self,
+        jobs: Optional[int] = None,
+        backend: Optional[str] = None,
+        stages: Optional[Dict[str, Tuple[str, Optional[int]]]] = None,
+    ) -> None:
+        self.jobs = jobs
+        self.default_backend = backend
+        self.stages = dict(stages or {})
+        self.used: Dict[str, Tuple[str, int]] = {}
+
+    @classmethod
+    def from_options(
+        cls, jobs: Optional[int] = None, options: Tuple[str, ...] = ()
+    ) -> 'ExecutorConfig':
+        config = cls(jobs)
+        for option in options:
+            stage, backend, stage_jobs = parse_backend(option)
+            if stage is None:
+                config.default_backend = backend
+                config.jobs = stage_jobs or config.jobs
+            else:
+                config.stages[stage] = backend, stage_jobs
+        return config
+
+    def backend(self, stage: str) -> str:
+        backend, _ = self.stages.get(stage, (None, None))
+        return backend or self.default_backend or STAGE_BACKENDS[stage]
+
+    def jobs_for(self, stage: str) -> int:
+        """Requested number of workers for stage, defaults to CPU count."""
+        if self.backend(stage) == 'inline':
+            return 1
+        _, jobs = self.stages.get(stage, (None, None))
+        return jobs or self.jobs or os.cpu_count() or 1
+
+    def create(
+        self,
+        stage: str,
+        max_workers: Optional[int] = None,
+        initializer: Optional[Callable[..., Any]] = None,
+        initargs: Tuple[Any, ...] = (),
+    ) -> concurrent.futures.Executor:
+        backend = self.backend(stage)
+        workers = 1 if backend == 'inline' else max_workers or self.jobs_for(stage)
+        self.used[stage] = backend, workers
+        return EXECUTOR_TYPES[backend](
+            max_workers=workers, initializer=initializer, initargs=initargs
+        )
+
+
+def report_executors(config: ExecutorConfig) -> None:
+    for stage, (backend, workers) in config.used.items():
+        print(f'Executor: {stage} stage used {backend} ({workers} worker(s))')
@@ -1,25 +1,45 @@
+import io
 import os
 import itertools
-from typing import IO, Iterable, Mapping, Tuple, cast
+from typing import IO, Dict, Iterable, List, Mapping, Sequence, Set, Tuple, cast
 
 from . import lpak
+from .memory import UNLIMITED, MemoryBudget
 from .resource import read_extractmap
 from .utils import copy_stream_buffered
 
 
-def extract_files(archive: lpak.LPakArchive, files: Iterable[str], output_dir: str):
-    os.makedirs(output_dir, exist_ok=True)
-    for fname in files:
-        with archive.open(fname, 'rb') as src, open(
-            os.path.join(output_dir, os.path.basename(fname)), 'wb'
-        ) as out:
-            src = cast(IO[bytes], src)
-            yield from copy_stream_buffered(src, out)
+def extract_members(
+    archive: lpak.LPakArchive,
+    targets: Mapping[str, Sequence[str]],
+    buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+):
+    """Extract each member to its output directories, in order of position
+    in archive file"""
+    for output_dir in set(itertools.chain.from_iterable(targets.values())):
+        os.makedirs(output_dir, exist_ok=True)
+    for fname in archive.in_read_order(targets):
+        for output_dir in targets[fname]:
+            with archive.open(fname, 'rb') as src, open(
+                os.path.join(output_dir, os.path.basename(fname)), 'wb'
+            ) as out:
+                src = cast(IO[bytes], src)
+                yield from copy_stream_buffered(src, out, buffer_size)
+
+
+def extract_files(
+    archive: lpak.LPakArchive,
+    files: Iterable[str],
+    output_dir: str,
+    buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+):
+    targets = {fname: [output_dir] for fname in files}
+    return extract_members(archive, targets, buffer_size)
 
 
 def get_files_to_extract(
     archive: lpak.LPakArchive, data_files: Mapping[str, Iterable[str]]
-) -> Iterable[Tuple[str, Iterable[str]]]:
+) -> Iterable[Tuple[str, Set[str]]]:
     for output_dir, patterns in data_files.items():
         yield output_dir, set(
             itertools.chain.from_iterable(
@@ -29,19 +49,25 @@ def get_files_to_extract(
 
 
 def extract_progress(
-    archive: lpak.LPakArchive, data_files: Mapping[str, Iterable[str]]
+    archive: lpak.LPakArchive,
+    data_files: Mapping[str, Iterable[str]],
+    budget: MemoryBudget = UNLIMITED,
 ):
     dirs, files = zip(*get_files_to_extract(archive, data_files))
     all_files = itertools.chain.from_iterable(files)
     action = 'Extracting data files...'
     total_bytes = sum(archive.index[fname].decompressed_size for fname in all_files)
     if total_bytes > 0:
-        writes = itertools.chain.from_iterable(
-            extract_files(archive, dir_files, output_dir)
-            for output_dir, dir_files in zip(dirs, files)
-        )
+        # all directories are extracted in a single pass over archive
+        targets: Dict[str, List[str]] = {}
+        for output_dir, dir_files in zip(dirs, files):
+            for fname in dir_files:
+                targets.setdefault(fname, []).append(output_dir)
+        writes = extract_members(archive, targets, budget.buffer_size)
         yield action, (writes, total_bytes)
 
 
-def extract(archive: lpak.LPakArchive, index_dir: str):
-    return extract_progress(archive, read_extractmap(index_dir))
+def extract(
+    archive: lpak.LPakArchive, index_dir: str, budget: MemoryBudget = UNLIMITED
+):
+    return extract_progress(archive, read_extractmap(index_dir), budget)
@@ -1,24 +1,29 @@
 import builtins
 import io
+import itertools
 import os
+import sys
+from array import array
 from struct import Struct
 from contextlib import contextmanager
 from types import TracebackType
 from typing import (
     Any,
-    Dict,
     IO,
     Iterable,
     Iterator,
     List,
+    Mapping,
     NamedTuple,
     Optional,
+    Sequence,
     Tuple,
     Type,
     cast,
 )
 from pathlib import Path
 
+from .memory import KIB, MIB
 from .streamview import PartialStreamView, Stream
 from .utils import copy_stream_buffered
 
@@ -31,6 +36,11 @@ FLOAT32LE = Struct('<f')
 FILE_ENTRY_1_0 = Struct('<5I')
 FILE_ENTRY_1_5 = Struct('<Q4I')
 
+# members this close are read together, skipping gap is cheaper than a seek
+READ_GAP = 256 * KIB
+# limit of a single read span, so readahead hints do not flood page cache
+MAX_READ_SPAN = 64 * MIB
+
 
 class LPAKFileEntry(NamedTuple):
     data_offset: int
@@ -91,47 +101,155 @@ def read_header(
     return tag, version, views
 
 
-def build_index(ftable: Iterable[LPAKFileEntry], names: Iterable[str]):
-    # ftable = sorted(ftable, key=operator.attrgetter('name_offset'))
-    # off = 0
-    for name, entry in zip(names, ftable):
-        # assert off == entry.name_offset, (off, entry.name_offset)
-        # print(off, name, len(name), entry)
-        yield os.path.normpath(name), entry
-        # off += len(name)
+class ReadSpan(NamedTuple):
+    offset: int
+    size: int
+    members: Tuple[str, ...]
+
+
+def plan_reads(
+    index: Mapping[str, 'LPAKFileEntry'],
+    fnames: Iterable[str],
+    gap: int = READ_GAP,
+    max_size: int = MAX_READ_SPAN,
+) -> List[ReadSpan]:
+    """Group members into sequential reads, ordered by their data offset"""
+    members = sorted(
+        dict.fromkeys(fnames), key=lambda fname: index[fname].data_offset
+    )
+    spans: List[ReadSpan] = []
+    group: List[str] = []
+    start = end = 0
+    for fname in members:
+        member = index[fname]
+        member_end = member.data_offset + member.decompressed_size
+        adjacent = member.data_offset - end <= gap and member_end - start <= max_size
+        if group and adjacent:
+            group.append(fname)
+            end = max(end, member_end)
+            continue
+        if group:
+            spans.append(ReadSpan(start, end - start, tuple(group)))
+        group, start, end = [fname], member.data_offset, member_end
+    if group:
+        spans.append(ReadSpan(start, end - start, tuple(group)))
+    return spans
+
+
+def advise(stream: IO[bytes], offset: int, size: int, advice: str) -> None:
+    """Readahead hint for given range of file, ignored where not supported"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return
+    try:
+        os.posix_fadvise(fd, offset, size, getattr(os, advice))
+    except OSError:
+        pass
+
+
+# file table is loaded as a flat array of little endian 32 bit words
+assert array('I').itemsize == UINT32LE.size
+
+
+class LPakIndex(Mapping[str, LPAKFileEntry]):
+    """File table kept packed as read from archive, names in a single blob,
+    looked up through open addressing hash table of row numbers"""
+
+    def __init__(self, table: array, width: int, names: Sequence[str]) -> None:
+        self._table = table
+        self._width = width
+        encoded = [name.encode() for name in names]
+        self._names = b'\0'.join(encoded)
+        starts = itertools.accumulate((len(name) + 1 for name in encoded), initial=0)
+        self._starts = array('I', itertools.islice(starts, len(encoded)))
+        self._slots = array('i', [-1]) * (1 << (2 * len(encoded)).bit_length())
+        self._mask = len(self._slots) - 1
+        unique = True
+        for row, name in enumerate(encoded):
+            slot = self._find_slot(name)
+            unique = unique and self._slots[slot] < 0
+            self._slots[slot] = row
+        # duplicate names point to last entry, like dict built from pairs
+        self._rows = None if unique else array(
+            'I', sorted(row for row in self._slots if row >= 0)
+        )
+
+    def _name(self, row: int) -> bytes:
+        start = self._starts[row]
+        end = self._names.find(b'\0', start)
+        return self._names[start : end if end >= 0 else len(self._names)]
+
+    def _matches(self, row: int, name: bytes) -> bool:
+        start = self._starts[row]
+        end = start + len(name)
+        return self._names.startswith(name, start) and (
+            end == len(self._names) or self._names[end] == 0
+        )
+
+    def _find_slot(self, name: bytes) -> int:
+        slot = hash(name) & self._mask
+        while self._slots[slot] >= 0 and not self._matches(self._slots[slot], name):
+            slot = (slot + 1) & self._mask
+        return slot
+
+    def _entry(self, row: int) -> LPAKFileEntry:
+        base = row * self._width
+        fields = self._table[base : base + self._width]
+        if self._width > len(LPAKFileEntry._fields):
+            # 64 bit data offset, split to low and high words
+            return LPAKFileEntry(fields[0] | fields[1] << 32, *fields[2:])
+        return LPAKFileEntry(*fields)
+
+    def _row(self, fname: object) -> int:
+        if not isinstance(fname, str):
+            return -1
+        return self._slots[self._find_slot(fname.encode())]
+
+    def __getitem__(self, fname: str) -> LPAKFileEntry:
+        row = self._row(fname)
+        if row < 0:
+            raise KeyError(fname)
+        return self._entry(row)
+
+    def __contains__(self, fname: object) -> bool:
+        return self._row(fname) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        rows = range(len(self._starts)) if self._rows is None else self._rows
+        return (self._name(row).decode() for row in rows)
+
+    def __len__(self) -> int:
+        return len(self._starts) if self._rows is None else len(self._rows)
+
+
+def build_index(ftable: bytes, entry: Struct, names: bytes) -> LPakIndex:
+    table = array('I', ftable[: len(ftable) - len(ftable) % entry.size])
+    if sys.byteorder == 'big':
+        table.byteswap()
+    width = entry.size // UINT32LE.size
+    rnames = names.decode().split('\0')[: len(table) // width]
+    return LPakIndex(table, width, [os.path.normpath(name) for name in rnames])
 
 
 def get_findex(
     stream: IO[bytes],
     views: List[Tuple[int, IO[bytes]]],
-) -> Tuple[Dict[str, LPAKFileEntry], IO[bytes]]:
+) -> Tuple[LPakIndex, IO[bytes]]:
     index, ftable, names, data = views
-    assert stream.tell() == index[0]
-    _ = [val[0] for val in read_iter(UINT32LE, index[1])]
-    assert stream.tell() == ftable[0]
-    rftable = [LPAKFileEntry(*val) for val in read_iter(FILE_ENTRY_1_0, ftable[1])]
-    assert stream.tell() == names[0]
-    rnames = [name.decode() for name in names[1].read().split(b'\0')]
-    assert stream.tell() == data[0]
-    findex = dict(build_index(rftable, rnames))
-    return findex, data[1]
+    # lookup is done through names, so index table is not read
+    return build_index(ftable[1].read(), FILE_ENTRY_1_0, names[1].read()), data[1]
 
 
 def get_findex_v15(
     stream: IO[bytes],
     views: List[Tuple[int, IO[bytes]]],
-) -> Tuple[Dict[str, LPAKFileEntry], IO[bytes]]:
+) -> Tuple[LPakIndex, IO[bytes]]:
     ftable, index, names, data = views
-    _ = stream.read(8)
-    assert stream.tell() == ftable[0], (stream.tell(), ftable[0])
-    rftable = [LPAKFileEntry(*val) for val in read_iter(FILE_ENTRY_1_5, ftable[1])]
-    assert stream.tell() == index[0], (stream.tell(), index[0])
-    _ = [val[0] for val in read_iter(UINT32LE, index[1])]
-    assert stream.tell() == names[0]
-    rnames = [name.decode() for name in names[1].read().split(b'\0')]
-    assert stream.tell() == data[0]
-    findex = dict(build_index(rftable, rnames))
-    return findex, data[1]
+    # lookup is done through names, so index table is not read
+    return build_index(ftable[1].read(), FILE_ENTRY_1_5, names[1].read()), data[1]
 
 
 class LPakArchive:
@@ -141,6 +259,8 @@ class LPakArchive:
         read_findex = get_findex if version < 1.5 else get_findex_v15
         self.index, self._data = read_findex(self._stream, views)
         self.path = filename
+        self.version = version
+        self.data_offset = views[3][0]
 
     def __enter__(self) -> 'LPakArchive':
         return self
@@ -165,7 +285,42 @@ class LPakArchive:
         excinst: Optional[BaseException],
         exctb: Optional[TracebackType],
     ) -> Optional[bool]:
-        return self._stream.close()
+        self.close()
+        return None
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def locate(self, fname: str) -> Tuple[int, int]:
+        """Absolute offset and size of member data in the archive file"""
+        try:
+            member = self.index[os.path.normpath(fname)]
+        except KeyError:
+            raise ValueError(f'no member {fname}')
+        return self.data_offset + member.data_offset, member.decompressed_size
+
+    def plan_reads(self, fnames: Optional[Iterable[str]] = None) -> List[ReadSpan]:
+        """Sequential reads of given members (or all), at absolute file offsets"""
+        fnames = self.index if fnames is None else map(os.path.normpath, fnames)
+        return [
+            span._replace(offset=self.data_offset + span.offset)
+            for span in plan_reads(self.index, fnames)
+        ]
+
+    def sort_by_offset(self, fnames: Optional[Iterable[str]] = None) -> List[str]:
+        return [fname for span in self.plan_reads(fnames) for fname in span.members]
+
+    def in_read_order(self, fnames: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """Members ordered by position in archive file, the span following
+        the current one is hinted to be read ahead"""
+        spans = self.plan_reads(fnames)
+        advise(self._stream, 0, 0, 'POSIX_FADV_SEQUENTIAL')
+        for ahead in spans[:1]:
+            advise(self._stream, ahead.offset, ahead.size, 'POSIX_FADV_WILLNEED')
+        for idx, span in enumerate(spans):
+            for ahead in spans[idx + 1 : idx + 2]:
+                advise(self._stream, ahead.offset, ahead.size, 'POSIX_FADV_WILLNEED')
+            yield from span.members
 
     def iglob(self, pattern: str) -> Iterator[str]:
         return (fname for fname in self.index if Path(fname).match(pattern))
@@ -177,46 +332,24 @@ class LPakArchive:
         return [fname for fname in self.index if fname.startswith(path)]
 
     def __iter__(self) -> Iterator[Tuple[str, Stream]]:
-        for fname, member in self.index.items():
+        for fname in self.in_read_order():
+            member = self.index[fname]
             self._data.seek(member.data_offset)
             yield fname, PartialStreamView(self._data, member.decompressed_size)
 
     def extractall(self, dirname: str, pattern: str = GLOB_ALL) -> None:
-        for fname, filestream in self:
-            if Path(fname).match(pattern):
-                sdir = os.path.dirname(fname)
-                os.makedirs(os.path.join(dirname, sdir), exist_ok=True)
-                with builtins.open(os.path.join(dirname, fname), 'wb') as out_file:
-                    filestream = cast(IO[bytes], filestream)
-                    for _ in copy_stream_buffered(filestream, out_file):
-                        pass
+        for fname in self.in_read_order(self.iglob(pattern)):
+            sdir = os.path.dirname(fname)
+            os.makedirs(os.path.join(dirname, sdir), exist_ok=True)
+            with self.open(fname, 'rb') as filestream, builtins.open(
+                os.path.join(dirname, fname), 'wb'
+            ) as out_file:
+                filestream = cast(IO[bytes], filestream)
+                for _ in copy_stream_buffered(filestream, out_file):
+                    pass
 
 
 @contextmanager
 def open(*args, **kwargs) -> Iterator[LPakArchive]:
     yield LPakArchive(*args, **kwargs)
 
-
-if __name__ == '__main__':
-    import sys
-
-    if not len(sys.argv) > 1:
-        print('ERROR: Archive filename not specified.')
-        sys.exit(1)
-
-    filename = sys.argv[1]
-    pattern = sys.argv[2] if len(sys.argv) > 2 else GLOB_ALL
-    print(filename, pattern)
-    with open(filename) as lpak:
-
-        if pattern == GLOB_ALL:
-            assert set(lpak.iglob(pattern)) == set(fname for fname in lpak.index)
-
-        lpak.extractall('out', pattern)
-
-        # for fname in lpak.glob(pattern):
-        #     os.makedirs(os.path.dirname(fname), exist_ok=True)
-        #     # base = os.path.basename(fname)
-        #     with lpak.open(fname, 'rb') as f:
-        #         with builtins.open(fname, 'wb') as o:
-        #             o.write(f.read())
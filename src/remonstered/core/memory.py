@@ -0,0 +1,104 @@
+import io
+import os
+import re
+import sys
+import tempfile
+from typing import IO, NamedTuple, Optional, Tuple, cast
+
+try:
+    import resource as _rusage
+except ImportError:  # not available on Windows
+    _rusage = None  # type: ignore
+
+KIB = 1 << 10
+MIB = 1 << 20
+
+SIZE_UNITS = {'': 1, 'K': KIB, 'M': MIB, 'G': 1 << 30, 'T': 1 << 40}
+SIZE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d*)?)\s*([KMGT]?)(?:I?B)?\s*$', re.IGNORECASE)
+
+# rough footprint of an idle worker process (interpreter + imported modules)
+WORKER_OVERHEAD = 48 * MIB
+
+MIN_BUFFER_SIZE = 64 * KIB
+MAX_BUFFER_SIZE = 4 * MIB
+
+
+def parse_size(text: str) -> int:
+    match = SIZE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f'invalid size: {text!r}')
+    value, unit = match.groups()
+    return int(float(value) * SIZE_UNITS[unit.upper()])
+
+
+def format_size(size: int) -> str:
+    return f'{size / MIB:0.1f} MiB'
+
+
+class MemoryBudget(NamedTuple):
+    """Memory limit shared by all stages, `None` means unlimited."""
+
+    limit: Optional[int] = None
+
+    def workers(self, task_size: int, default: Optional[int] = None) -> Optional[int]:
+        """Number of workers that fit when each holds `task_size` bytes."""
+        if self.limit is None:
+            return default
+        available = default or os.cpu_count() or 1
+        per_worker = WORKER_OVERHEAD + task_size
+        return max(1, min(available, self.limit // per_worker))
+
+    def window(self, workers: Optional[int] = None) -> Optional[int]:
+        """Bytes of task input allowed in flight at once."""
+        if self.limit is None:
+            return None
+        reserved = (workers or 0) * WORKER_OVERHEAD
+        return max(self.limit - reserved, 0) // 2
+
+    @property
+    def buffer_size(self) -> int:
+        if self.limit is None:
+            return io.DEFAULT_BUFFER_SIZE
+        return max(MIN_BUFFER_SIZE, min(MAX_BUFFER_SIZE, self.limit // 256))
+
+    def spool(self, parts: int = 1) -> IO[bytes]:
+        """Scratch file kept in memory up to a quarter of the budget,
+        split between `parts` files used together."""
+        if self.limit is None:
+            return cast(IO[bytes], tempfile.TemporaryFile())
+        return cast(
+            IO[bytes],
+            # max_size of 0 would never roll over to disk
+            tempfile.SpooledTemporaryFile(max_size=max(1, self.limit // (4 * parts))),
+        )
+
+
+UNLIMITED = MemoryBudget()
+
+
+def _maxrss(who: int) -> int:
+    assert _rusage is not None
+    usage = _rusage.getrusage(who).ru_maxrss
+    # linux reports kilobytes, macos reports bytes
+    return usage if sys.platform == 'darwin' else usage * KIB
+
+
+def peak_memory_usage() -> Optional[Tuple[int, int]]:
+    """Peak resident size of this process and of the largest child process."""
+    if _rusage is None:
+        return None
+    return _maxrss(_rusage.RUSAGE_SELF), _maxrss(_rusage.RUSAGE_CHILDREN)
+
+
+def report_peak_memory(budget: MemoryBudget) -> None:
+    peak = peak_memory_usage()
+    if peak is None:
+        return
+    main, worker = peak
+    limit = (
+        f' (limit: {format_size(budget.limit)})' if budget.limit is not None else ''
+    )
+    print(
+        f'Peak memory: {format_size(main)} main process,'
+        f' {format_size(worker)} largest worker{limit}'
+    )
@@ -0,0 +1,207 @@
+import concurrent.futures
+import hashlib
+import mmap
+from struct import Struct
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+UINT32BE = Struct('>I')
+
+# offset in original resource, position of entry in audio data,
+# size of tags and size of audio stream following the tags
+INDEX_ENTRY = Struct('>4s3I')
+
+
+class MonsterEntry(NamedTuple):
+    offset: bytes
+    position: int
+    tags_size: int
+    stream_size: int
+
+
+def read_monster_index(data: memoryview) -> Tuple[List[MonsterEntry], int]:
+    """Parse index of monster file, returns entries and position of audio data"""
+    if len(data) < UINT32BE.size:
+        raise ValueError('not a monster file: missing index size')
+    index_size = UINT32BE.unpack_from(data)[0]
+    data_offset = UINT32BE.size + index_size
+    if index_size % INDEX_ENTRY.size or data_offset > len(data):
+        raise ValueError(f'not a monster file: invalid index size {index_size}')
+    entries = [
+        MonsterEntry(*fields)
+        for fields in INDEX_ENTRY.iter_unpack(data[UINT32BE.size : data_offset])
+    ]
+    for entry in entries:
+        end = data_offset + entry.position + entry.tags_size + entry.stream_size
+        if end > len(data):
+            raise ValueError(
+                f'not a monster file: entry {entry.offset.hex()} out of bounds'
+            )
+    return entries, data_offset
+
+
+class MonsterReader:
+    """Random access to samples of monster file, samples are memoryviews
+    of mapped file, so they must be released before the reader is closed.
+    Entries keep order of the index, the same offset may appear more than once."""
+
+    def __init__(self, filename: str) -> None:
+        self.path = filename
+        with open(filename, 'rb') as stream:
+            try:
+                self._mmap = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f'not a monster file: {filename} is empty')
+        self._data = memoryview(self._mmap)
+        try:
+            self.entries, self.data_offset = read_monster_index(self._data)
+        except ValueError:
+            self.close()
+            raise
+        self.index: Dict[bytes, List[MonsterEntry]] = {}
+        for entry in self.entries:
+            self.index.setdefault(entry.offset, []).append(entry)
+
+    def __enter__(self) -> 'MonsterReader':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._data.release()
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[MonsterEntry]:
+        return iter(self.entries)
+
+    def __contains__(self, offset: object) -> bool:
+        return offset in self.index
+
+    def lookup(self, offset: bytes) -> List[MonsterEntry]:
+        return self.index.get(offset, [])
+
+    def tags(self, entry: MonsterEntry) -> memoryview:
+        start = self.data_offset + entry.position
+        return self._data[start : start + entry.tags_size]
+
+    def audio(self, entry: MonsterEntry) -> memoryview:
+        start = self.data_offset + entry.position + entry.tags_size
+        return self._data[start : start + entry.stream_size]
+
+    def __getitem__(self, entry: MonsterEntry) -> Tuple[memoryview, memoryview]:
+        return self.tags(entry), self.audio(entry)
+
+
+class MonsterDiff(NamedTuple):
+    missing: List[bytes]
+    extra: List[bytes]
+    reordered: bool
+    tags: List[bytes]
+    audio: List[bytes]
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.missing or self.extra or self.reordered or self.tags or self.audio
+        )
+
+
+# offset with number of its previous occurrences, unique within an index
+EntryKey = Tuple[bytes, int]
+
+
+def entry_keys(offsets: Iterable[bytes]) -> List[EntryKey]:
+    seen: Dict[bytes, int] = {}
+    keys = []
+    for offset in offsets:
+        keys.append((offset, seen.get(offset, 0)))
+        seen[offset] = seen.get(offset, 0) + 1
+    return keys
+
+
+def hash_audio(reader: MonsterReader, entry: MonsterEntry) -> bytes:
+    with reader.audio(entry) as audio:
+        return hashlib.blake2b(audio).digest()
+
+
+def hash_samples(
+    reader: MonsterReader,
+    entries: Iterable[MonsterEntry],
+    workers: Optional[int] = None,
+) -> List[bytes]:
+    # hashlib releases GIL while hashing, so threads read mapped file in parallel
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda entry: hash_audio(reader, entry), entries))
+
+
+def diff_index(
+    expected: Sequence[Tuple[bytes, bytes]], actual: Sequence[Tuple[bytes, bytes]]
+) -> MonsterDiff:
+    """Compare (offset, tags) entries of two indices, repeated offsets are
+    matched by their order of appearance"""
+    expected_tags = dict(zip(entry_keys(offset for offset, _ in expected), expected))
+    actual_tags = dict(zip(entry_keys(offset for offset, _ in actual), actual))
+    common = [key for key in expected_tags if key in actual_tags]
+    return MonsterDiff(
+        missing=[key[0] for key in expected_tags if key not in actual_tags],
+        extra=[key[0] for key in actual_tags if key not in expected_tags],
+        reordered=common != [key for key in actual_tags if key in expected_tags],
+        tags=[
+            key[0]
+            for key in common
+            if expected_tags[key][1] != actual_tags[key][1]
+        ],
+        audio=[],
+    )
+
+
+def read_entries(reader: MonsterReader) -> List[Tuple[bytes, bytes]]:
+    entries = []
+    for entry in reader:
+        with reader.tags(entry) as tags:
+            entries.append((entry.offset, bytes(tags)))
+    return entries
+
+
+def diff_monsters(
+    expected: MonsterReader, actual: MonsterReader, workers: Optional[int] = None
+) -> MonsterDiff:
+    diff = diff_index(read_entries(expected), read_entries(actual))
+    expected_entries = dict(zip(entry_keys(e.offset for e in expected), expected))
+    actual_entries = dict(zip(entry_keys(e.offset for e in actual), actual))
+    common = [key for key in expected_entries if key in actual_entries]
+    expected_digests = hash_samples(
+        expected, (expected_entries[key] for key in common), workers
+    )
+    actual_digests = hash_samples(
+        actual, (actual_entries[key] for key in common), workers
+    )
+    return diff._replace(
+        audio=[
+            key[0]
+            for key, expected_digest, actual_digest in zip(
+                common, expected_digests, actual_digests
+            )
+            if expected_digest != actual_digest
+        ]
+    )
+
+
+def diff_tables(
+    index: Iterable[Tuple[bytes, bytes, str]], actual: MonsterReader
+) -> MonsterDiff:
+    """Compare monster file against entries of monster.tbl and tags.tbl"""
+    return diff_index(
+        [(offset, tags) for offset, tags, _ in index], read_entries(actual)
+    )
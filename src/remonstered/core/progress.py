@@ -0,0 +1,150 @@
+import contextlib
+import datetime
+import multiprocessing
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+from .memory import format_size
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+# seconds between progress updates of parent, workers only bump counters
+POLL_INTERVAL = 0.2
+
+# weighted progress is counted in whole units of estimated microseconds,
+# so updates add up exactly to the total computed upfront
+PROGRESS_UNITS = 1_000_000
+
+
+class ProgressUpdate(NamedTuple):
+    done: int
+    status: str
+
+
+class ProgressReporter:
+    def __init__(self, counters, base: int, stages: Sequence[str]) -> None:
+        self._counters = counters
+        self._slots = {stage: base + idx for idx, stage in enumerate(stages)}
+
+    def add(self, stage: str, size: int) -> None:
+        self._counters[self._slots[stage]] += size
+
+
+class ProgressChannel:
+    """Bytes processed in each stage, counted in shared memory.
+    Every worker claims a row of its own, so counters need no locking."""
+
+    def __init__(self, rows: int, stages: Sequence[str]) -> None:
+        self.rows = rows
+        self.stages = tuple(stages)
+        self._counters = multiprocessing.RawArray('q', rows * len(self.stages))
+        self._next_row = multiprocessing.Value('i', 0)
+        self.started = time.perf_counter()
+
+    def claim(self) -> ProgressReporter:
+        with self._next_row.get_lock():
+            row = self._next_row.value % self.rows
+            self._next_row.value += 1
+        return ProgressReporter(self._counters, row * len(self.stages), self.stages)
+
+    def totals(self) -> Dict[str, int]:
+        width = len(self.stages)
+        return {
+            stage: sum(self._counters[idx::width])
+            for idx, stage in enumerate(self.stages)
+        }
+
+
+_worker = threading.local()
+
+
+def init_progress(channel: Optional[ProgressChannel]) -> None:
+    _worker.reporter = channel.claim() if channel is not None else None
+
+
+def report_progress(stage: str, size: int) -> None:
+    reporter = getattr(_worker, 'reporter', None)
+    if reporter is not None:
+        reporter.add(stage, size)
+
+
+@contextlib.contextmanager
+def task_progress(stage: str, size: int) -> Iterator[Callable[[int], None]]:
+    """Report bytes processed by task, the rest of `size` is reported when done"""
+    reported = 0
+
+    def report(amount: int) -> None:
+        nonlocal reported
+        amount = min(amount, size - reported)
+        if amount > 0:
+            reported += amount
+            report_progress(stage, amount)
+
+    yield report
+    report(size - reported)
+
+
+def reporting(
+    chunks: Iterable[bytes], report: Callable[[int], None]
+) -> Iterator[bytes]:
+    for chunk in chunks:
+        report(len(chunk))
+        yield chunk
+
+
+def weighted_progress(weights: Mapping[str, float], sizes: Mapping[str, int]) -> int:
+    """Estimated cost of bytes processed in each stage, in whole units"""
+    cost = sum(weight * sizes.get(stage, 0) for stage, weight in weights.items())
+    return int(cost * PROGRESS_UNITS)
+
+
+def format_status(
+    totals: Mapping[str, int], sizes: Mapping[str, int], elapsed: float
+) -> str:
+    """Throughput and remaining time of each started stage"""
+    status: List[str] = []
+    for stage, done in totals.items():
+        if not done or not elapsed:
+            continue
+        rate = done / elapsed
+        eta = datetime.timedelta(seconds=int(max(sizes[stage] - done, 0) / rate))
+        status.append(f'{stage}: {format_size(int(rate))}/s, ETA {eta}')
+    return '; '.join(status)
+
+
+def watch_progress(
+    channel: ProgressChannel,
+    pending: Iterable['Future'],
+    on_done: Callable[['Future'], None],
+    weights: Mapping[str, float],
+    sizes: Mapping[str, int],
+    interval: float = POLL_INTERVAL,
+) -> Iterator[ProgressUpdate]:
+    """Poll counters while waiting for futures, yielding weighted units
+    processed since previous update, along with status of each stage"""
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    waiting = set(pending)
+    reported = 0
+    while waiting:
+        done, waiting = wait(waiting, timeout=interval, return_when=FIRST_COMPLETED)
+        for future in done:
+            on_done(future)
+        totals = channel.totals()
+        progress = weighted_progress(weights, totals)
+        status = format_status(totals, sizes, time.perf_counter() - channel.started)
+        yield ProgressUpdate(progress - reported, status)
+        reported = progress
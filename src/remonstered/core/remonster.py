@@ -1,72 +1,135 @@
 #!/usr/bin/env python
+import contextlib
 import io
-import tempfile
 import itertools
 from struct import Struct
-from typing import IO, Iterable, Optional, Tuple
+from typing import IO, Iterable, Optional, Sequence, Tuple, Union
 
 from . import lpak
 from .audio import get_output_extension
 from .convert import format_streams
-from .utils import copy_stream_buffered, consume, iterate
+from .executors import ExecutorConfig
+from .memory import UNLIMITED, MemoryBudget
+from .utils import (
+    FileRange,
+    consume,
+    copy_file_range,
+    copy_stream_buffered,
+    drive_parallel,
+    iterate,
+)
 from .resource import fetch_sources
 
 UINT32BE = Struct('>I')
 
+Payload = Union[bytes, FileRange]
+
+
+def write_payload(
+    audio_stream: IO[bytes], stream: Payload, source: Optional[IO[bytes]]
+) -> int:
+    if isinstance(stream, FileRange):
+        # copy located sample straight from the archive file
+        assert source is not None
+        copy_file_range(source, audio_stream, stream.offset, stream.size)
+        return stream.size
+    audio_stream.write(stream)
+    return len(stream)
+
 
 def collect_streams(
-    output_idx: IO[bytes],
-    audio_stream: IO[bytes],
-    streams: Iterable[Tuple[bytes, bytes, bytes]],
+    outputs: Sequence[Tuple[IO[bytes], IO[bytes]]],
+    streams: Iterable[Tuple[bytes, bytes, Sequence[Payload]]],
+    source: Optional[IO[bytes]] = None,
 ):
-    for offset, tags, stream in streams:
-        output_idx.write(offset)
-        output_idx.write(UINT32BE.pack(audio_stream.tell()))
-        output_idx.write(UINT32BE.pack(len(tags)))
+    for offset, tags, payloads in streams:
+        for (output_idx, audio_stream), stream in zip(outputs, payloads):
+            output_idx.write(offset)
+            output_idx.write(UINT32BE.pack(audio_stream.tell()))
+            output_idx.write(UINT32BE.pack(len(tags)))
 
-        audio_stream.write(tags)
-        audio_stream.write(stream)
-        output_idx.write(UINT32BE.pack(len(stream)))
+            audio_stream.write(tags)
+            size = write_payload(audio_stream, stream, source)
+            output_idx.write(UINT32BE.pack(size))
 
-        yield offset, tags, stream
+        yield offset, tags, payloads
 
 
-def finalize_output(output: IO[bytes], index: IO[bytes], stream: IO[bytes]):
+def finalize_output(
+    output: IO[bytes],
+    index: IO[bytes],
+    stream: IO[bytes],
+    buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+):
     output.write(UINT32BE.pack(index.tell()))
     index.seek(0, io.SEEK_SET)
     stream.seek(0, io.SEEK_SET)
 
     return itertools.chain(
-        copy_stream_buffered(index, output), copy_stream_buffered(stream, output)
+        copy_stream_buffered(index, output, buffer_size),
+        copy_stream_buffered(stream, output, buffer_size),
     )
 
 
 def build_monster(
-    streams: Iterable[Tuple[bytes, bytes, bytes]], output_file: str, index_size: int
+    streams: Iterable[Tuple[bytes, bytes, Sequence[Payload]]],
+    output_files: Sequence[str],
+    index_size: int,
+    budget: MemoryBudget = UNLIMITED,
+    source_file: Optional[str] = None,
 ):
-    with io.BytesIO() as output_idx, tempfile.TemporaryFile() as audio_stream:
+    with contextlib.ExitStack() as stack:
+        outputs = [
+            (
+                stack.enter_context(io.BytesIO()),
+                stack.enter_context(budget.spool(len(output_files))),
+            )
+            for _ in output_files
+        ]
+        source = stack.enter_context(open(source_file, 'rb')) if source_file else None
 
         action = 'Collecting audio streams...'
-        streaming = iterate(collect_streams(output_idx, audio_stream, streams))
+        streaming = iterate(collect_streams(outputs, streams, source))
         yield action, (streaming, index_size)
         consume(streaming)
 
         action = 'Writing output file...'
-        total_size = output_idx.tell() + audio_stream.tell()
-        with open(output_file, 'wb') as output:
-            writes = finalize_output(output, output_idx, audio_stream)
-            yield action, (writes, total_size)
-            consume(writes)
+        if len(output_files) > 1:
+            action = 'Writing output files...'
+        total_size = sum(
+            output_idx.tell() + audio_stream.tell()
+            for output_idx, audio_stream in outputs
+        )
+        writes = [
+            finalize_output(
+                stack.enter_context(open(output_file, 'wb')),
+                output_idx,
+                audio_stream,
+                budget.buffer_size,
+            )
+            for output_file, (output_idx, audio_stream) in zip(output_files, outputs)
+        ]
+        parallel_writes = drive_parallel(writes)
+        yield action, (parallel_writes, total_size)
+        consume(parallel_writes)
 
 
 def remonster(
     archive: lpak.LPakArchive,
     index_dir: Optional[str] = '.',
-    target_ext: Optional[str] = None,
+    target_exts: Sequence[str] = (),
+    budget: MemoryBudget = UNLIMITED,
+    executors: Optional[ExecutorConfig] = None,
 ):
-    with fetch_sources(archive, index_dir) as source:
+    with fetch_sources(archive, index_dir, target_exts) as source:
         ext, index, source_streams = source
-        target_ext = target_ext or ext
-        output_ext = get_output_extension(target_ext)
-        streams = format_streams(source_streams, ext, target_ext)
-        yield from build_monster(streams, f'monster.{output_ext}', len(index))
+        target_exts = list(dict.fromkeys(target_exts)) or [ext]
+        output_files = [
+            f'monster.{get_output_extension(target_ext)}' for target_ext in target_exts
+        ]
+        streams = format_streams(
+            source_streams, ext, target_exts, budget, executors
+        )
+        yield from build_monster(
+            streams, output_files, len(index), budget, archive.path
+        )
@@ -3,13 +3,31 @@ import binascii
 import os
 import json
 from contextlib import contextmanager
-from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from typing import (
+    IO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import click
 
 from . import lpak
-from .soundbank import get_soundbanks_view
+from .soundbank import (
+    RAW_SAMPLE_EXTENSIONS,
+    SampleReader,
+    get_soundbanks_view,
+    locate_soundbanks_samples,
+    read_soundbanks_extension,
+)
 from .missing import build_missing_entry
+from .utils import FileRange
 
 
 def read_hex(hexstr: str) -> bytes:
@@ -42,6 +60,20 @@ def read_streams(
         yield offset, tags, stream
 
 
+def locate_streams(
+    samples: Mapping[str, FileRange],
+    stream: IO[bytes],
+    index: Iterable[Tuple[bytes, bytes, str]],
+) -> Iterator[Tuple[bytes, bytes, Union[bytes, FileRange]]]:
+    for offset, tags, fname in index:
+        sample: Union[bytes, FileRange, None] = samples.get(fname, None)
+        if not sample:
+            sample = build_missing_entry(SampleReader(stream, samples), fname)
+        assert sample is not None, fname
+
+        yield offset, tags, sample
+
+
 def resource(base_path: Optional[str], *paths: str) -> str:
     """Get absolute path to resource, works for dev and for PyInstaller."""
     if not base_path:
@@ -85,13 +117,27 @@ class FailedToLoadFileError(click.ClickException):
 
 @contextmanager
 def fetch_sources(
-    archive: lpak.LPakArchive, index_dir: Optional[str] = '.'
+    archive: lpak.LPakArchive,
+    index_dir: Optional[str] = '.',
+    target_exts: Sequence[str] = (),
 ) -> Iterator[
-    Tuple[str, List[Tuple[bytes, bytes, str]], Iterator[Tuple[bytes, bytes, bytes]]]
+    Tuple[
+        str,
+        List[Tuple[bytes, bytes, str]],
+        Iterator[Tuple[bytes, bytes, Union[bytes, FileRange]]],
+    ]
 ]:
+    """Read sources, samples are located in archive instead of read
+    when they can be copied to output as is."""
     try:
         index = read_tables(index_dir)
         audiomap = read_audiomap(index_dir)
+        ext = read_soundbanks_extension(archive, audiomap)
+        if ext in RAW_SAMPLE_EXTENSIONS and set(target_exts) <= {ext}:
+            samples = locate_soundbanks_samples(archive, audiomap)
+            with open(archive.path, 'rb') as stream:
+                yield ext, index, locate_streams(samples, stream, index)
+            return
         with get_soundbanks_view(archive, audiomap) as stream_view:
             ext, sounds = stream_view
             yield ext, index, read_streams(sounds, index)
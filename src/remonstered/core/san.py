@@ -0,0 +1,149 @@
+import io
+import itertools
+from struct import Struct
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .memory import MIB
+from .progress import reporting
+from .utils import suppress_stdout
+
+UINT32BE = Struct('>I')
+
+# SMUSH chunks are aligned to 2 bytes
+ALIGN = 2
+
+# raw frame bytes handed to a single compression task
+FRAME_BATCH_SIZE = 4 * MIB
+
+MapBatches = Callable[
+    [Callable[[List[bytes]], List[bytes]], Iterable[List[bytes]]],
+    Iterable[List[bytes]],
+]
+
+
+def read_chunk(stream: IO[bytes]) -> Tuple[bytes, bytes]:
+    tag = stream.read(4)
+    size = UINT32BE.unpack(stream.read(UINT32BE.size))[0]
+    data = stream.read(size)
+    if len(data) != size:
+        raise EOFError(f'got EOF while reading chunk {tag!r}')
+    stream.read(size % ALIGN)
+    return tag, data
+
+
+def read_anim(stream: IO[bytes]) -> Tuple[bytes, Iterator[bytes]]:
+    """Read SMUSH animation header and lazily read frames one at a time"""
+    tag = stream.read(4)
+    assert tag == b'ANIM', tag
+    end = 8 + UINT32BE.unpack(stream.read(UINT32BE.size))[0]
+    tag, header = read_chunk(stream)
+    assert tag == b'AHDR', tag
+
+    def frames() -> Iterator[bytes]:
+        while stream.tell() < end:
+            tag, frame = read_chunk(stream)
+            assert tag == b'FRME', tag
+            yield frame
+
+    return header, frames()
+
+
+def walk_chunks(
+    stream: IO[bytes], end: Optional[int] = None
+) -> Iterator[Tuple[int, bytes, int]]:
+    """Read only tag and size of consecutive chunks, seeking past payloads"""
+    offset = stream.tell()
+    while end is None or offset < end:
+        header = stream.read(8)
+        if len(header) < 8:
+            if end is None:
+                return
+            raise EOFError(f'got EOF while reading chunk header at {offset}')
+        size = UINT32BE.unpack(header[4:])[0]
+        yield offset, header[:4], size
+        offset += 8 + size + size % ALIGN
+        stream.seek(offset, io.SEEK_SET)
+
+
+def get_frame_offsets(stream: IO[bytes]) -> Iterator[int]:
+    """Offsets of SMUSH animation frames, as listed in .flu files"""
+    start = stream.tell()
+    tag = stream.read(4)
+    assert tag == b'ANIM', tag
+    end = start + 8 + UINT32BE.unpack(stream.read(UINT32BE.size))[0]
+    chunks = walk_chunks(stream, end)
+    _, tag, _ = next(chunks)
+    assert tag == b'AHDR', tag
+    for offset, _, _ in chunks:
+        yield offset - start
+
+
+def batch_frames(
+    frames: Iterable[bytes], batch_size: int = FRAME_BATCH_SIZE
+) -> Iterator[List[bytes]]:
+    batch: List[bytes] = []
+    size = 0
+    for frame in frames:
+        batch.append(frame)
+        size += len(frame)
+        if size >= batch_size:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+def compress_frame_batch(frames: Sequence[bytes]) -> List[bytes]:
+    from nutcracker.compress_san import compress_frames
+    from nutcracker.smush.preset import smush
+
+    with suppress_stdout():
+        return list(
+            compress_frames(smush.read_chunks(frame) for frame in frames)
+        )
+
+
+def write_chunk(out: IO[bytes], chunk: bytes) -> None:
+    out.write(chunk)
+    out.write(b'\0' * (len(chunk) % ALIGN))
+
+
+def write_anim(out: IO[bytes], header: bytes, frames: Iterable[bytes]) -> List[int]:
+    """Write SMUSH animation from composed frame chunks,
+    returns absolute offset of each frame, as listed in .flu files"""
+    from nutcracker.smush import ahdr
+    from nutcracker.smush.preset import smush
+
+    start = out.tell()
+    out.write(b'ANIM' + UINT32BE.pack(0))
+    parsed = ahdr.from_bytes(header)
+    assert not (parsed.dummy2 or parsed.dummy3)
+    write_chunk(out, smush.mktag('AHDR', ahdr.to_bytes(parsed)))
+
+    offsets = []
+    for frame in frames:
+        offsets.append(out.tell() - start)
+        write_chunk(out, frame)
+
+    end = out.tell()
+    out.seek(start + 4, io.SEEK_SET)
+    out.write(UINT32BE.pack(end - start - 8))
+    out.seek(end, io.SEEK_SET)
+    return offsets
+
+
+def compress_san(
+    res: IO[bytes],
+    out: IO[bytes],
+    map_batches: MapBatches = map,
+    batch_size: int = FRAME_BATCH_SIZE,
+    report: Optional[Callable[[int], None]] = None,
+) -> List[int]:
+    """Same output as `strip_compress_san`, but streams frames and compresses
+    them in batches using given map function, so long videos can be spread
+    across workers"""
+    header, frames = read_anim(res)
+    if report is not None:
+        frames = reporting(frames, report)
+    compressed = map_batches(compress_frame_batch, batch_frames(frames, batch_size))
+    return write_anim(out, header, itertools.chain.from_iterable(compressed))
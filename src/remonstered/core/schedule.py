@@ -0,0 +1,161 @@
+import heapq
+import json
+import os
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+_END = object()
+
+# seconds per input byte, used until a stage is measured on this machine
+DEFAULT_RATES = {
+    'san': 5e-8,  # SAN frames compression
+    'ogv': 5e-9,  # audio extraction from HD video
+    'audio': 1e-6,  # decoding and encoding single audio sample
+}
+
+# weight of rates measured in current run against persisted ones
+LEARNING_RATE = 0.5
+
+
+class Measurement(NamedTuple):
+    stage: str
+    size: int
+    elapsed: float
+
+
+def get_cost_model_path() -> str:
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    return os.path.join(cache_dir, 'remonstered', 'costs.json')
+
+
+class CostModel:
+    """Per-byte processing rates of each stage, learned from earlier runs."""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None) -> None:
+        self.rates = dict(rates or {})
+        self._measured: Dict[str, Tuple[int, float]] = {}
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'CostModel':
+        try:
+            with open(path or get_cost_model_path(), 'r') as model_file:
+                return cls(json.load(model_file))
+        except (OSError, ValueError):
+            return cls()
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or get_cost_model_path()
+        for stage, (size, elapsed) in self._measured.items():
+            if not size:
+                continue
+            rate = elapsed / size
+            old = self.rates.get(stage)
+            self.rates[stage] = rate if old is None else (
+                LEARNING_RATE * rate + (1 - LEARNING_RATE) * old
+            )
+        self._measured.clear()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as model_file:
+                json.dump(self.rates, model_file, indent=4)
+        except OSError:
+            # model is only a cache, scheduling still works with defaults
+            pass
+
+    def rate(self, stage: str) -> float:
+        if stage in self.rates:
+            return self.rates[stage]
+        return DEFAULT_RATES[stage.split(':')[0]]
+
+    def estimate(self, stage: str, size: int) -> float:
+        return self.rate(stage) * size
+
+    def record(self, measurements: Iterable[Measurement]) -> None:
+        for stage, size, elapsed in measurements:
+            total_size, total_elapsed = self._measured.get(stage, (0, 0.0))
+            self._measured[stage] = total_size + size, total_elapsed + elapsed
+
+
+def timed(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def longest_first(tasks: Iterable[Any], cost: Callable[[Any], float]) -> List[Any]:
+    """Order tasks for greedy placement on idle workers (LPT scheduling)."""
+    return sorted(tasks, key=cost, reverse=True)
+
+
+def map_longest_first(
+    executor: 'Executor',
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    window: Optional[int] = None,
+    size: Callable[[Any], int] = len,
+) -> Iterator[Any]:
+    """Like `bounded_map`, keeps at most `window` bytes of input in flight,
+    but reads ahead up to another `window` bytes and submits largest inputs
+    of the lookahead first, results are still yielded in input order."""
+    items = iter(items)
+    lookahead: Dict[int, Tuple[Any, int]] = {}
+    largest: List[Tuple[int, int]] = []
+    futures: Dict[int, Tuple['Future', int]] = {}
+    read = done = 0
+    ahead = in_flight = 0
+
+    def submit(idx: int) -> None:
+        nonlocal ahead, in_flight
+        item, item_size = lookahead.pop(idx)
+        futures[idx] = executor.submit(fn, item), item_size
+        ahead -= item_size
+        in_flight += item_size
+
+    while True:
+        while window is None or not lookahead or ahead < window:
+            item = next(items, _END)
+            if item is _END:
+                break
+            item_size = size(item)
+            lookahead[read] = item, item_size
+            heapq.heappush(largest, (-item_size, read))
+            ahead += item_size
+            read += 1
+
+        while largest:
+            neg_size, idx = largest[0]
+            if idx not in lookahead:
+                # already submitted as next result to yield
+                heapq.heappop(largest)
+                continue
+            if window is not None and in_flight and in_flight - neg_size > window:
+                break
+            heapq.heappop(largest)
+            submit(idx)
+
+        if done == read:
+            return
+        if done in lookahead:
+            # next result is needed even when window is full
+            submit(done)
+        future, item_size = futures.pop(done)
+        result = future.result()
+        in_flight -= item_size
+        done += 1
+        yield result
@@ -1,16 +1,52 @@
 import contextlib
+import io
 from collections import ChainMap
-from typing import Iterator, Mapping, Tuple
-
-import fsb5
+from struct import Struct
+from typing import IO, TYPE_CHECKING, Dict, Iterator, Mapping, Tuple, cast
 
 from .lpak import LPakArchive
+from .utils import FileRange
+
+if TYPE_CHECKING:
+    import fsb5
+
+UINT32LE = Struct('<I')
+UINT64LE = Struct('<Q')
+FSB5_HEADER = Struct('<4s6I8s16s8s')
+
+# offset of sample format field in FSB5 header
+FSB5_MODE_OFFSET = 24
+
+sample_extensions = {
+    11: 'mp3',
+    15: 'ogg',
+}
+
+# formats where sample payloads are stored verbatim in the soundbank,
+# vorbis samples need their headers rebuilt by fsb5
+RAW_SAMPLE_EXTENSIONS = {'mp3'}
+
+
+def read_sample_extension(pak: LPakArchive, fname: str) -> str:
+    """Read sample format from soundbank header without parsing samples"""
+    with pak.open(fname, 'rb') as sb:
+        sb.seek(FSB5_MODE_OFFSET)
+        mode = UINT32LE.unpack(sb.read(UINT32LE.size))[0]
+    return sample_extensions.get(mode, 'bin')
+
+
+def read_soundbanks_extension(pak: LPakArchive, audiomap: Mapping[str, str]) -> str:
+    exts = list(set(read_sample_extension(pak, fname) for fname in audiomap))
+    assert len(exts) == 1, exts
+    return exts[0]
 
 
 @contextlib.contextmanager
 def open_soundbank(
     pak: LPakArchive, fname: str, prefix: str = ''
-) -> Iterator[fsb5.FSB5]:
+) -> Iterator['fsb5.FSB5']:
+    import fsb5
+
     with pak.open(fname, 'rb') as sb:
         yield fsb5.FSB5(sb, prefix=prefix)
 
@@ -27,3 +63,76 @@ def get_soundbanks_view(
         exts = list(set(sb.get_sample_extension() for sb in banks))
         assert len(exts) == 1
         yield exts[0], ChainMap(*banks)
+
+
+def read_sample_ranges(stream: IO[bytes]) -> Iterator[Tuple[str, FileRange]]:
+    """Locate sample payloads relative to soundbank start, without reading them"""
+    magic, version, nsamples, headers_size, names_size, data_size, *_ = (
+        FSB5_HEADER.unpack(stream.read(FSB5_HEADER.size))
+    )
+    assert magic == b'FSB5', magic
+    header_size = FSB5_HEADER.size + (UINT32LE.size if version == 0 else 0)
+    stream.seek(header_size, io.SEEK_SET)
+
+    offsets = []
+    for _ in range(nsamples):
+        raw = UINT64LE.unpack(stream.read(UINT64LE.size))[0]
+        offsets.append(((raw >> 6) & 0x0FFFFFFF) * 16)
+        next_chunk = raw & 1
+        while next_chunk:
+            raw = UINT32LE.unpack(stream.read(UINT32LE.size))[0]
+            next_chunk = raw & 1
+            stream.seek((raw >> 1) & 0xFFFFFF, io.SEEK_CUR)
+
+    names = [f'{idx:04d}' for idx in range(nsamples)]
+    if names_size:
+        stream.seek(header_size + headers_size, io.SEEK_SET)
+        table = stream.read(names_size)
+        for idx, (name_offset,) in enumerate(
+            UINT32LE.iter_unpack(table[: nsamples * UINT32LE.size])
+        ):
+            names[idx] = table[name_offset : table.index(b'\0', name_offset)].decode()
+
+    data_start = header_size + headers_size + names_size
+    for name, start, end in zip(names, offsets, offsets[1:] + [data_size]):
+        yield name, FileRange(data_start + start, end - start)
+
+
+def locate_samples(
+    pak: LPakArchive, fname: str, prefix: str = ''
+) -> Dict[str, FileRange]:
+    base, _ = pak.locate(fname)
+    with pak.open(fname, 'rb') as sb:
+        return {
+            name[len(prefix) :] if name.startswith(prefix) else name: FileRange(
+                base + sample.offset, sample.size
+            )
+            for name, sample in read_sample_ranges(cast(IO[bytes], sb))
+        }
+
+
+def locate_soundbanks_samples(
+    pak: LPakArchive, audiomap: Mapping[str, str]
+) -> Mapping[str, FileRange]:
+    return ChainMap(
+        *(locate_samples(pak, fname, prefix=pre) for fname, pre in audiomap.items())
+    )
+
+
+class SampleReader(Mapping[str, bytes]):
+    """Read located samples from archive file on demand"""
+
+    def __init__(self, stream: IO[bytes], samples: Mapping[str, FileRange]) -> None:
+        self._stream = stream
+        self._samples = samples
+
+    def __getitem__(self, name: str) -> bytes:
+        sample = self._samples[name]
+        self._stream.seek(sample.offset, io.SEEK_SET)
+        return self._stream.read(sample.size)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._samples)
+
+    def __len__(self) -> int:
+        return len(self._samples)
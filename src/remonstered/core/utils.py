@@ -1,19 +1,74 @@
 import io
+import collections
 import functools
-from typing import Any, Callable, IO, Iterator
+import mmap
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-from tqdm import tqdm
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+
+_SUPPRESS_LOCK = threading.Lock()
+# stdout replaced by first of concurrently suppressing threads, and their count
+_suppressed: List[Any] = []
+
+
+@contextmanager
+def suppress_stdout():
+    # worker threads may suppress at the same time,
+    # original stdout is restored only when the last one is done
+    with _SUPPRESS_LOCK:
+        if not _suppressed:
+            _suppressed.extend([sys.stdout, 0])
+            sys.stdout = open(os.devnull, "w")
+        _suppressed[1] += 1
+    try:
+        yield
+    finally:
+        with _SUPPRESS_LOCK:
+            _suppressed[1] -= 1
+            if not _suppressed[1]:
+                sys.stdout.close()
+                sys.stdout = _suppressed.pop(0)
+                _suppressed.clear()
 
-print_progress = functools.partial(
-    tqdm,
-    ascii='->>=',
-    bar_format='[{bar:50}] Completed: {percentage:0.2f}%',
-)
+
+def print_progress(*args: Any, **kwargs: Any):
+    from tqdm import tqdm
+
+    return tqdm(
+        *args,
+        ascii='->>=',
+        bar_format='[{bar:50}] Completed: {percentage:0.2f}%{postfix}',
+        **kwargs,
+    )
 
 
 def drive_progress(it: Iterator[Any], *args: Any, **kwargs: Any) -> None:
     with print_progress(it, *args, **kwargs) as pbar:
         for dp in it:
+            # aggregated progress carries status of stages along
+            status = getattr(dp, 'status', None)
+            if status is not None:
+                dp = dp.done
+                pbar.set_postfix_str(status, refresh=False)
             pbar.update(dp)
 
 
@@ -28,11 +83,115 @@ def buffered(
     return iter(functools.partial(source, buffer_size), b'')
 
 
-def copy_stream_buffered(in_stream: IO[bytes], out_stream: IO[bytes]) -> Iterator[int]:
-    for buffer in buffered(in_stream.read):
+def copy_stream_buffered(
+    in_stream: IO[bytes],
+    out_stream: IO[bytes],
+    buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+) -> Iterator[int]:
+    for buffer in buffered(in_stream.read, buffer_size):
         out_stream.write(buffer)
         yield len(buffer)
 
 
+class FileRange(NamedTuple):
+    offset: int
+    size: int
+
+
+def _copy_mapped(
+    src: IO[bytes], dst: IO[bytes], offset: int, size: int
+) -> None:
+    start = offset - offset % mmap.ALLOCATIONGRANULARITY
+    with mmap.mmap(
+        src.fileno(), offset + size - start, access=mmap.ACCESS_READ, offset=start
+    ) as view, memoryview(view) as data, data[offset - start :] as chunk:
+        dst.write(chunk)
+
+
+def copy_file_range(src: IO[bytes], dst: IO[bytes], offset: int, size: int) -> None:
+    """Append byte range of `src` file to `dst` without reading it into Python."""
+    if not size:
+        return
+    dst.flush()
+    pos = dst.tell()
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                count = os.copy_file_range(  # type: ignore
+                    src.fileno(),
+                    dst.fileno(),
+                    size - copied,
+                    offset + copied,
+                    pos + copied,
+                )
+                if not count:
+                    break
+                copied += count
+        except OSError:
+            # e.g. cross-device copy on older kernels, fall back to mapping
+            pass
+    dst.seek(pos + copied, io.SEEK_SET)
+    if copied < size:
+        _copy_mapped(src, dst, offset + copied, size - copied)
+
+
+def drive_parallel(tasks: Sequence[Iterator[int]]) -> Iterator[int]:
+    """Drive each progress iterator on its own thread, yielding their progress"""
+    if len(tasks) == 1:
+        yield from tasks[0]
+        return
+
+    import queue
+    from concurrent.futures import ThreadPoolExecutor
+
+    progress: 'queue.Queue[Optional[int]]' = queue.Queue()
+
+    def drive(task: Iterator[int]) -> None:
+        try:
+            for step in task:
+                progress.put(step)
+        finally:
+            progress.put(None)
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [executor.submit(drive, task) for task in tasks]
+        running = len(futures)
+        while running:
+            step = progress.get()
+            if step is None:
+                running -= 1
+                continue
+            yield step
+        for future in futures:
+            future.result()
+
+
 def iterate(it: Iterator[Any]) -> Iterator[int]:
     return (1 for _ in it)
+
+
+def bounded_map(
+    executor: 'Executor',
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    window: Optional[int] = None,
+    size: Callable[[Any], int] = len,
+) -> Iterator[Any]:
+    """Like `executor.map`, but keeps at most `window` bytes of input in flight."""
+    if window is None:
+        yield from executor.map(fn, items)
+        return
+    pending: Deque[Tuple['Future', int]] = collections.deque()
+    in_flight = 0
+    for item in items:
+        item_size = size(item)
+        while pending and in_flight + item_size > window:
+            future, done_size = pending.popleft()
+            in_flight -= done_size
+            yield future.result()
+        pending.append((executor.submit(fn, item), item_size))
+        in_flight += item_size
+    while pending:
+        future, _ = pending.popleft()
+        yield future.result()
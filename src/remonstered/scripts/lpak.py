@@ -0,0 +1,180 @@
+import argparse
+import os
+import sys
+from typing import IO, Optional, Sequence, cast
+
+from remonstered.core import lpak
+from remonstered.core.memory import format_size
+from remonstered.core.utils import consume, copy_stream_buffered
+
+# Heavy codec and video modules are only imported by the stages that use them,
+# keep this script on the archive layer so queries start fast.
+
+
+def cmd_ls(archive: lpak.LPakArchive, args: argparse.Namespace) -> None:
+    for fname in archive.iglob(args.pattern):
+        if args.long:
+            member = archive.index[fname]
+            print(f'{member.data_offset:>12} {member.decompressed_size:>12} {fname}')
+        else:
+            print(fname)
+
+
+def cmd_info(archive: lpak.LPakArchive, args: argparse.Namespace) -> None:
+    members = list(archive.index.values())
+    print(f'Archive: {archive.path}')
+    print(f'Version: {archive.version}')
+    print(f'Members: {len(members)}')
+    print(f'Size: {format_size(sum(m.decompressed_size for m in members))}')
+    print(f'Compressed members: {sum(1 for m in members if m.is_compressed)}')
+
+
+def cmd_cat(archive: lpak.LPakArchive, args: argparse.Namespace) -> None:
+    for fname in args.members:
+        with archive.open(fname, 'rb') as src:
+            consume(copy_stream_buffered(cast(IO[bytes], src), sys.stdout.buffer))
+    sys.stdout.buffer.flush()
+
+
+def cmd_extract(archive: lpak.LPakArchive, args: argparse.Namespace) -> None:
+    archive.extractall(args.output_dir, args.pattern)
+
+
+def cmd_plan(archive: lpak.LPakArchive, args: argparse.Namespace) -> None:
+    from remonstered.core.audio import get_output_extension, output_exts
+    from remonstered.core.cutscenes import (
+        estimate_costs,
+        find_cutscenes,
+        find_videohd,
+        get_base_size,
+    )
+    from remonstered.core.extract import get_files_to_extract
+    from remonstered.core.resource import read_audiomap, read_extractmap, read_tables
+    from remonstered.core.schedule import CostModel
+    from remonstered.core.soundbank import (
+        locate_soundbanks_samples,
+        read_soundbanks_extension,
+    )
+
+    requested = [ext for exts in args.audio_formats for ext in exts]
+    for ext in requested:
+        if ext not in output_exts:
+            available = '|'.join(output_exts)
+            raise ValueError(
+                f'unsupported audio format: {ext!r}, expected [{available}]'
+            )
+
+    model = CostModel.load()
+    workers = os.cpu_count() or 1
+
+    index = read_tables(args.index_dir)
+    audiomap = read_audiomap(args.index_dir)
+    src_ext = read_soundbanks_extension(archive, audiomap)
+    target_exts = list(dict.fromkeys(requested)) or [src_ext]
+    action = 'copy'
+    if set(target_exts) != {src_ext}:
+        samples = locate_soundbanks_samples(archive, audiomap).values()
+        # samples are decoded once and encoded to every target format
+        targets = '+'.join(target_exts)
+        cost = model.estimate(
+            f'audio:{targets}', sum(sample.size for sample in samples)
+        )
+        action = f'convert {src_ext} -> {targets}, est. {cost / workers:0.1f}s'
+    for target_ext in target_exts:
+        print(
+            f'monster.{get_output_extension(target_ext)}: {len(index)} samples'
+            f' from {len(audiomap)} soundbank(s) ({action})'
+        )
+
+    for output_dir, files in get_files_to_extract(
+        archive, read_extractmap(args.index_dir)
+    ):
+        total = sum(archive.index[fname].decompressed_size for fname in files)
+        print(f'{output_dir}: extract {len(files)} file(s), {format_size(total)}')
+
+    costs = {
+        fname: sum(
+            estimate_costs(archive, fname, find_videohd(archive, fname), model)
+        )
+        for fname in sorted(find_cutscenes(archive))
+    }
+    for fname, cost in costs.items():
+        size = format_size(get_base_size(archive, fname))
+        print(f'{fname}: cutscene, {size}, est. {cost:0.1f}s')
+    if costs:
+        # long videos are split into frame batches, so work spreads evenly
+        stage = sum(costs.values()) / workers
+        print(f'cutscenes: {len(costs)} file(s), est. {stage:0.1f}s')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='lpak', description='Inspect and extract LPAK archives'
+    )
+    subparsers = parser.add_subparsers(dest='command', metavar='<command>')
+    subparsers.required = True
+
+    ls = subparsers.add_parser('ls', help='List archive members')
+    ls.add_argument('filename', metavar='<filename>')
+    ls.add_argument('pattern', metavar='<pattern>', nargs='?', default=lpak.GLOB_ALL)
+    ls.add_argument(
+        '-l', '--long', action='store_true', help='Show data offsets and sizes'
+    )
+    ls.set_defaults(func=cmd_ls)
+
+    info = subparsers.add_parser('info', help='Show archive summary')
+    info.add_argument('filename', metavar='<filename>')
+    info.set_defaults(func=cmd_info)
+
+    cat = subparsers.add_parser('cat', help='Write archive members to stdout')
+    cat.add_argument('filename', metavar='<filename>')
+    cat.add_argument('members', metavar='<member>', nargs='+')
+    cat.set_defaults(func=cmd_cat)
+
+    extract = subparsers.add_parser('extract', help='Extract archive members')
+    extract.add_argument('filename', metavar='<filename>')
+    extract.add_argument(
+        'pattern', metavar='<pattern>', nargs='?', default=lpak.GLOB_ALL
+    )
+    extract.add_argument(
+        '-o', '--output', dest='output_dir', metavar='<path>', default='out'
+    )
+    extract.set_defaults(func=cmd_extract)
+
+    plan = subparsers.add_parser('plan', help='Show what remonster would build')
+    plan.add_argument('filename', metavar='<filename>')
+    plan.add_argument(
+        '-f',
+        '--format',
+        dest='audio_formats',
+        metavar='<format>',
+        action='append',
+        type=lambda value: [ext.strip() for ext in value.split(',') if ext.strip()],
+        default=[],
+    )
+    plan.add_argument(
+        '-i', '--index', dest='index_dir', metavar='<path>', default=None
+    )
+    plan.set_defaults(func=cmd_plan)
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    if not os.path.isfile(args.filename):
+        print(f'ERROR: Archive not found: {args.filename}.')
+        sys.exit(1)
+    with lpak.open(args.filename) as archive:
+        try:
+            args.func(archive, args)
+        except ValueError as exc:
+            print(f'ERROR: {exc}.')
+            sys.exit(1)
+        except OSError as exc:
+            print(f'ERROR: Failed to load file: {exc.filename}.')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
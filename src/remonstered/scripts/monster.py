@@ -0,0 +1,116 @@
+import argparse
+import os
+import sys
+from typing import Optional, Sequence
+
+from remonstered.core.monster import (
+    MonsterDiff,
+    MonsterReader,
+    diff_monsters,
+    diff_tables,
+)
+
+
+def cmd_ls(reader: MonsterReader, args: argparse.Namespace) -> None:
+    for entry in reader.entries:
+        print(
+            f'{entry.offset.hex()} {reader.data_offset + entry.position:>12}'
+            f' {entry.tags_size:>6} {entry.stream_size:>10}'
+        )
+
+
+def cmd_cat(reader: MonsterReader, args: argparse.Namespace) -> None:
+    for offset in args.offsets:
+        entries = reader.lookup(bytes.fromhex(offset))
+        if not entries:
+            raise ValueError(f'entry not found: {offset}')
+        for entry in entries:
+            with reader.audio(entry) as audio:
+                sys.stdout.buffer.write(audio)
+    sys.stdout.buffer.flush()
+
+
+def print_diff(diff: MonsterDiff) -> None:
+    for title, offsets in (
+        ('missing', diff.missing),
+        ('extra', diff.extra),
+        ('different tags', diff.tags),
+        ('different audio', diff.audio),
+    ):
+        for offset in offsets:
+            print(f'{offset.hex()}: {title}')
+    if diff.reordered:
+        print('entries are in different order')
+
+
+def cmd_diff(reader: MonsterReader, args: argparse.Namespace) -> None:
+    if os.path.isdir(args.other):
+        from remonstered.core.resource import read_tables
+
+        diff = diff_tables(read_tables(args.other), reader)
+    else:
+        with MonsterReader(args.other) as other:
+            diff = diff_monsters(other, reader, args.jobs)
+    print_diff(diff)
+    if diff:
+        sys.exit(1)
+    print('No differences found.')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='monster', description='Inspect and compare monster sound files'
+    )
+    subparsers = parser.add_subparsers(dest='command', metavar='<command>')
+    subparsers.required = True
+
+    ls = subparsers.add_parser(
+        'ls', help='List offset, position, tags size and audio size of entries'
+    )
+    ls.add_argument('filename', metavar='<filename>')
+    ls.set_defaults(func=cmd_ls)
+
+    cat = subparsers.add_parser('cat', help='Write audio of entries to stdout')
+    cat.add_argument('filename', metavar='<filename>')
+    cat.add_argument(
+        'offsets',
+        metavar='<offset>',
+        nargs='+',
+        help='Offset in hex, all entries with repeated offset are written',
+    )
+    cat.set_defaults(func=cmd_cat)
+
+    diff = subparsers.add_parser(
+        'diff',
+        help='Compare with another monster file, or with .tbl files in directory',
+    )
+    diff.add_argument('filename', metavar='<filename>')
+    diff.add_argument('other', metavar='<other>')
+    diff.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        metavar='<n>',
+        default=None,
+        help='Number of threads hashing audio',
+    )
+    diff.set_defaults(func=cmd_diff)
+
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        with MonsterReader(args.filename) as reader:
+            args.func(reader, args)
+    except ValueError as exc:
+        print(f'ERROR: {exc}.')
+        sys.exit(1)
+    except OSError as exc:
+        print(f'ERROR: Failed to load file: {exc.filename}.')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
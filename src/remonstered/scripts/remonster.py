@@ -5,21 +5,69 @@ import click
 from remonstered.core import lpak
 from remonstered.core.audio import output_exts
 from remonstered.core.cutscenes import convert_cutscenes
+from remonstered.core.executors import (
+    BACKENDS,
+    STAGE_BACKENDS,
+    ExecutorConfig,
+    parse_backend,
+    report_executors,
+)
 from remonstered.core.extract import extract
+from remonstered.core.memory import (
+    WORKER_OVERHEAD,
+    MemoryBudget,
+    format_size,
+    parse_size,
+    report_peak_memory,
+)
 from remonstered.core.remonster import remonster
 from remonstered.core.utils import drive_progress
 
 
+def read_memory_budget(ctx, param, value):
+    if value is None:
+        return MemoryBudget()
+    try:
+        limit = parse_size(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+    # every worker needs at least room for interpreter and its modules
+    if limit < WORKER_OVERHEAD:
+        raise click.BadParameter(
+            f'memory budget must be at least {format_size(WORKER_OVERHEAD)}'
+        )
+    return MemoryBudget(limit)
+
+
+def read_executor_options(ctx, param, value):
+    try:
+        for option in value:
+            parse_backend(option)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+    return value
+
+
+def read_audio_formats(ctx, param, value):
+    return [
+        audio_format.strip()
+        for option in value
+        for audio_format in option.split(',')
+        if audio_format.strip()
+    ]
+
+
 @click.command()
 @click.argument('filename', metavar='<filename>', required=False, default='./tenta.cle')
 @click.option(
     '--format',
     '-f',
-    'audio_format',
+    'audio_formats',
     type=str,
     metavar=f"[{'|'.join(output_exts)}]",
-    default=None,
-    help='Output audio format',
+    multiple=True,
+    callback=read_audio_formats,
+    help='Output audio format, repeat or separate with commas for several outputs',
 )
 @click.option(
     '--index',
@@ -30,17 +78,53 @@ from remonstered.core.utils import drive_progress
     default=None,
     help='Path to directory with .tbl files',
 )
+@click.option(
+    '--max-memory',
+    '-m',
+    'budget',
+    type=str,
+    metavar='<size>',
+    default=None,
+    callback=read_memory_budget,
+    help='Memory budget for all stages (e.g. 512M, 2G)',
+)
+@click.option(
+    '--jobs',
+    '-j',
+    'jobs',
+    type=click.IntRange(min=1),
+    metavar='<n>',
+    default=None,
+    help='Number of workers for each stage (default: number of CPUs)',
+)
+@click.option(
+    '--executor',
+    '-e',
+    'executor_options',
+    type=str,
+    metavar=f"[<stage>=][{'|'.join(BACKENDS)}][:<n>]",
+    multiple=True,
+    callback=read_executor_options,
+    help=(
+        'Executor backend for all stages, or for one of'
+        f" [{'|'.join(STAGE_BACKENDS)}] stages, optionally with number of workers"
+    ),
+)
 @click.help_option('-h', '--help')
-def main(filename, index_dir, audio_format):
+def main(filename, index_dir, audio_formats, budget, jobs, executor_options):
+    executors = ExecutorConfig.from_options(jobs, executor_options)
     with lpak.open(filename) as archive:
         prog = itertools.chain(
-            remonster(archive, index_dir, audio_format),
-            extract(archive, index_dir),
-            convert_cutscenes(archive)
+            remonster(archive, index_dir, audio_formats, budget, executors),
+            extract(archive, index_dir, budget),
+            convert_cutscenes(archive, budget=budget, executors=executors)
         )
         for action, (task, total) in prog:
             print(action)
             drive_progress(task, total=total)
+    report_executors(executors)
+    if budget.limit is not None:
+        report_peak_memory(budget)
     print('Done!')
 
 
@@ -0,0 +1,55 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+from remonstered.core.executors import InlineExecutor
+
+
+def test_inline_runs_task_when_result_is_asked() -> None:
+    calls = []
+    executor = InlineExecutor()
+    future = executor.submit(calls.append, 1)
+    assert not calls
+    assert future.result() is None
+    assert calls == [1]
+    assert future.result() is None
+    assert calls == [1]
+
+
+def test_inline_runs_initializer_in_each_thread() -> None:
+    threads = []
+    executor = InlineExecutor(initializer=lambda: threads.append(threading.get_ident()))
+    executor.submit(int).result()
+    executor.submit(int).result()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as other:
+        other.submit(executor.submit(int).result).result()
+    assert len(threads) == 2
+    assert threads[0] == threading.get_ident()
+
+
+def test_inline_shutdown_runs_remaining_tasks_in_order() -> None:
+    calls = []
+    with InlineExecutor() as executor:
+        first = executor.submit(calls.append, 1)
+        executor.submit(calls.append, 2)
+    assert calls == [1, 2]
+    assert first.done()
+
+
+def test_inline_shutdown_without_wait_cancels_tasks() -> None:
+    calls = []
+    executor = InlineExecutor()
+    future = executor.submit(calls.append, 1)
+    executor.shutdown(wait=False)
+    assert future.cancelled()
+    with pytest.raises(concurrent.futures.CancelledError):
+        future.result()
+    assert not calls
+
+
+def test_inline_keeps_exception_of_task() -> None:
+    future = InlineExecutor().submit(int, 'x')
+    assert isinstance(future.exception(), ValueError)
+    with pytest.raises(ValueError):
+        future.result()
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from remonstered.core.lpak import (
+    FILE_ENTRY_1_0,
+    FILE_ENTRY_1_5,
+    LPAKFileEntry,
+    build_index,
+)
+
+ENTRIES = [
+    ('video/intro.san', LPAKFileEntry(0, 0, 100, 100, 0)),
+    ('data/tentacle.000', LPAKFileEntry(100, 16, 30, 50, 1)),
+    ('monster.sou', LPAKFileEntry(130, 34, 7, 7, 0)),
+]
+
+
+def pack_index(entry, entries):
+    ftable = b''.join(entry.pack(*fields) for _, fields in entries)
+    names = b''.join(name.encode() + b'\0' for name, _ in entries)
+    return build_index(ftable, entry, names)
+
+
+@pytest.mark.parametrize('entry', [FILE_ENTRY_1_0, FILE_ENTRY_1_5])
+def test_lookup(entry) -> None:
+    index = pack_index(entry, ENTRIES)
+    assert len(index) == len(ENTRIES)
+    for name, fields in ENTRIES:
+        assert index[os.path.normpath(name)] == fields
+        assert os.path.normpath(name) in index
+    assert index.get(os.path.normpath('data/tentacle.000')) == ENTRIES[1][1]
+    assert index.get('missing.txt') is None
+    assert 'missing.txt' not in index
+    assert 'video/intro' not in index
+    with pytest.raises(KeyError):
+        index['missing.txt']
+
+
+@pytest.mark.parametrize('entry', [FILE_ENTRY_1_0, FILE_ENTRY_1_5])
+def test_iteration_keeps_table_order(entry) -> None:
+    index = pack_index(entry, ENTRIES)
+    assert list(index) == [os.path.normpath(name) for name, _ in ENTRIES]
+    assert list(index.values()) == [fields for _, fields in ENTRIES]
+
+
+@pytest.mark.parametrize('entry', [FILE_ENTRY_1_0, FILE_ENTRY_1_5])
+def test_duplicate_names_last_wins(entry) -> None:
+    repeated = ('video/intro.san', LPAKFileEntry(200, 50, 10, 10, 0))
+    index = pack_index(entry, [*ENTRIES, repeated])
+    expected = {
+        os.path.normpath(name): fields for name, fields in [*ENTRIES, repeated]
+    }
+    assert len(index) == len(expected)
+    assert index[os.path.normpath('video/intro.san')] == repeated[1]
+    assert dict(index.items()) == expected
+
+
+def test_offsets_above_4gib() -> None:
+    large = LPAKFileEntry((5 << 32) + 123, 0, 10, 10, 0)
+    index = pack_index(FILE_ENTRY_1_5, [('video/outro.san', large)])
+    assert index[os.path.normpath('video/outro.san')].data_offset == (5 << 32) + 123
+
+
+@pytest.mark.parametrize('key', [None, 0, b'monster.sou'])
+def test_non_str_keys(key) -> None:
+    index = pack_index(FILE_ENTRY_1_0, ENTRIES)
+    assert key not in index
+    assert index.get(key) is None
+    with pytest.raises(KeyError):
+        index[key]
@@ -0,0 +1,76 @@
+import os
+from struct import Struct
+
+import pytest
+
+from remonstered.core.monster import (
+    MonsterEntry,
+    MonsterReader,
+    diff_tables,
+    read_monster_index,
+)
+from remonstered.core.remonster import build_monster
+from remonstered.core.resource import read_tables
+from remonstered.core.utils import consume
+
+UINT32BE = Struct('>I')
+
+TABLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'dott')
+
+
+def write_monster(path, index):
+    streams = (
+        (offset, tags, (fname.encode() * 3,)) for offset, tags, fname in index
+    )
+    for _, (task, _) in build_monster(streams, [str(path)], len(index)):
+        consume(task)
+
+
+def test_read_monster_index() -> None:
+    index = (
+        b'\x00\x00\x00\x10' + UINT32BE.pack(0) + UINT32BE.pack(1) + UINT32BE.pack(2)
+    ) + (b'\x00\x00\x00\x10' + UINT32BE.pack(3) + UINT32BE.pack(0) + UINT32BE.pack(4))
+    data = UINT32BE.pack(len(index)) + index + b'TaaBBBB'
+    entries, data_offset = read_monster_index(memoryview(data))
+    assert data_offset == 4 + 32
+    assert entries == [
+        MonsterEntry(b'\x00\x00\x00\x10', 0, 1, 2),
+        MonsterEntry(b'\x00\x00\x00\x10', 3, 0, 4),
+    ]
+
+
+def test_read_monster_index_out_of_bounds() -> None:
+    index = b'\x00\x00\x00\x10' + UINT32BE.pack(0) + UINT32BE.pack(1) + UINT32BE.pack(9)
+    with pytest.raises(ValueError):
+        read_monster_index(memoryview(UINT32BE.pack(len(index)) + index + b'T'))
+
+
+def test_round_trip_with_repeated_offset(tmp_path) -> None:
+    index = [
+        (b'\x00\x00\x00\x08', b'', 'first'),
+        (b'\x00\x00\x00\x18', b'\x01\x02', 'second'),
+        (b'\x00\x00\x00\x18', b'', 'repeated'),
+    ]
+    write_monster(tmp_path / 'monster.so3', index)
+    with MonsterReader(str(tmp_path / 'monster.so3')) as reader:
+        assert len(reader) == 3
+        assert [entry.offset for entry in reader] == [offset for offset, _, _ in index]
+        repeated = reader.lookup(b'\x00\x00\x00\x18')
+        assert [bytes(reader.audio(entry)) for entry in repeated] == [
+            b'secondsecondsecond',
+            b'repeatedrepeatedrepeated',
+        ]
+        assert bytes(reader.tags(repeated[0])) == b'\x01\x02'
+        assert not diff_tables(index, reader)
+
+        diff = diff_tables(index[:2], reader)
+        assert diff.extra == [b'\x00\x00\x00\x18']
+        assert not diff.reordered
+
+
+def test_round_trip_with_shipped_tables(tmp_path) -> None:
+    index = read_tables(TABLES_DIR)
+    write_monster(tmp_path / 'monster.so3', index)
+    with MonsterReader(str(tmp_path / 'monster.so3')) as reader:
+        assert len(reader) == len(index)
+        assert not diff_tables(index, reader)
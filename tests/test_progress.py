@@ -0,0 +1,37 @@
+from concurrent.futures import Future
+
+from remonstered.core.progress import (
+    ProgressChannel,
+    init_progress,
+    report_progress,
+    watch_progress,
+    weighted_progress,
+)
+
+
+def test_updates_add_up_to_total() -> None:
+    weights = {'san': 1.7e-7, 'ogv': 3.3e-9}
+    sizes = {'san': 123457, 'ogv': 987653}
+    chunks = [
+        (stage, part)
+        for stage, size in sizes.items()
+        for part in (size // 3, size // 3, size - 2 * (size // 3))
+    ]
+    channel = ProgressChannel(1, tuple(weights))
+    futures = [Future() for _ in chunks]
+    init_progress(channel)
+    try:
+        updates = watch_progress(
+            channel, futures, lambda _: None, weights, sizes, interval=0
+        )
+        done = 0
+        for (stage, part), future in zip(chunks, futures):
+            report_progress(stage, part)
+            future.set_result(None)
+            update = next(updates)
+            assert isinstance(update.done, int)
+            done += update.done
+        assert next(updates, None) is None
+    finally:
+        init_progress(None)
+    assert done == weighted_progress(weights, sizes)
@@ -0,0 +1,84 @@
+import io
+import random
+from struct import Struct
+
+import pytest
+from nutcracker.compress_san import strip_compress_san
+from nutcracker.smush.preset import smush
+
+from remonstered.core.san import compress_san, get_frame_offsets
+from remonstered.core.streamview import PartialStreamView
+from remonstered.core.utils import suppress_stdout
+
+UINT32BE = Struct('>I')
+AHDR_HEAD = Struct('<3H')
+AHDR_TAIL = Struct('<5I')
+
+
+def chunk(tag: bytes, data: bytes) -> bytes:
+    return tag + UINT32BE.pack(len(data)) + data + b'\0' * (len(data) % 2)
+
+
+def make_san(nframes: int, seed: int = 0, raw_frame: bool = False) -> bytes:
+    """Animation with frames of odd-sized, padded chunks,
+    optionally followed by an odd-sized frame of raw bytes"""
+    rnd = random.Random(seed)
+    header = AHDR_HEAD.pack(2, nframes, 0) + bytes(768)
+    header += AHDR_TAIL.pack(12, 1000, 22050, 0, 0)
+
+    def frame() -> bytes:
+        fobj = bytes(rnd.getrandbits(2) for _ in range(rnd.randint(1, 3001)))
+        return chunk(
+            b'FRME',
+            chunk(b'FOBJ', fobj)
+            + chunk(b'PSAD', b'\x01' * rnd.randint(1, 301))
+            + chunk(b'TRES', b'x' * rnd.randint(1, 9)),
+        )
+
+    frames = b''.join(frame() for _ in range(nframes))
+    if raw_frame:
+        frames += chunk(b'FRME', b'\x03' * 7) + frame()
+    body = chunk(b'AHDR', header) + frames
+    return b'ANIM' + UINT32BE.pack(len(body)) + body
+
+
+@pytest.mark.parametrize('batch_size', [1, 10, 8000, 1 << 30])
+def test_compress_san_matches_strip_compress_san(batch_size) -> None:
+    data = make_san(12)
+    with suppress_stdout():
+        expected = strip_compress_san(io.BytesIO(data))
+    with io.BytesIO() as out:
+        compress_san(io.BytesIO(data), out, batch_size=batch_size)
+        assert out.getvalue() == expected
+
+
+def read_smush_offsets(data: bytes):
+    """Frame offsets as listed in .flu files, read by nutcracker"""
+    with io.BytesIO(data) as stream:
+        anim = smush.assert_tag('ANIM', smush.untag(stream))
+        assert stream.read() == b''
+    _, *frames = smush.read_chunks(anim)
+    return [offset + 8 for offset, _ in frames]
+
+
+def test_frame_offsets_match_smush() -> None:
+    data = make_san(12, raw_frame=True)
+    expected = read_smush_offsets(data)
+    assert len(expected) == 14
+    assert list(get_frame_offsets(io.BytesIO(data))) == expected
+
+
+def test_frame_offsets_of_archive_member() -> None:
+    data = make_san(5, raw_frame=True)
+    with io.BytesIO(b'\x01' * 11 + data + b'ANIM' + bytes(16)) as archive:
+        archive.seek(11)
+        member = PartialStreamView(archive, len(data))
+        assert list(get_frame_offsets(member)) == read_smush_offsets(data)
+
+
+def test_frame_offsets_of_compressed_output() -> None:
+    with io.BytesIO() as out:
+        offsets = compress_san(io.BytesIO(make_san(12)), out)
+        out.seek(0)
+        assert list(get_frame_offsets(out)) == offsets
+        assert offsets == read_smush_offsets(out.getvalue())
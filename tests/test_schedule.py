@@ -0,0 +1,51 @@
+from concurrent.futures import Executor, Future
+
+from remonstered.core.schedule import map_longest_first
+
+
+class RecordingExecutor(Executor):
+    """Runs tasks only when their result is requested, recording submissions"""
+
+    def __init__(self) -> None:
+        self.submitted = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def submit(self, fn, item):  # type: ignore
+        executor = self
+        self.submitted.append(item)
+        self.in_flight += len(item)
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        class LazyFuture(Future):
+            def result(self, timeout=None):
+                executor.in_flight -= len(item)
+                return fn(item)
+
+        return LazyFuture()
+
+
+def test_results_in_input_order() -> None:
+    items = [b'a' * size for size in (1, 5, 2, 8, 3, 1, 7)]
+    results = map_longest_first(RecordingExecutor(), len, items, window=10)
+    assert list(results) == [len(item) for item in items]
+
+
+def test_largest_submitted_first_without_window() -> None:
+    executor = RecordingExecutor()
+    items = [b'a' * size for size in (1, 5, 2, 8)]
+    assert list(map_longest_first(executor, len, items)) == [1, 5, 2, 8]
+    assert [len(item) for item in executor.submitted] == [8, 5, 2, 1]
+
+
+def test_window_slides() -> None:
+    executor = RecordingExecutor()
+    items = [b'a' * 4] * 10
+    results = map_longest_first(executor, len, items, window=8)
+    assert next(results) == 4
+    assert len(executor.submitted) == 2
+    # first result frees room for another item, before the second is yielded
+    assert next(results) == 4
+    assert len(executor.submitted) == 3
+    assert list(results) == [4] * 8
+    assert executor.max_in_flight <= 8
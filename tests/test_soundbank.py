@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+from struct import Struct
+
+import fsb5
+import pytest
+
+from remonstered.core.soundbank import FSB5_HEADER, read_sample_ranges
+from remonstered.core.utils import copy_file_range
+
+UINT32LE = Struct('<I')
+UINT64LE = Struct('<Q')
+
+# sample format of MPEG soundbanks
+MODE_MPEG = 11
+
+SAMPLES = {
+    'sfx_door': bytes(range(256)) * 3,
+    'EN_ben_LINE1': b'\xff\xfb' + b'\x55' * 1001,
+    'EN_ben_LINE2': b'\xff\xfb' * 17,
+}
+
+
+def metadata_chunk(chunk_type: int, data: bytes, more: bool) -> bytes:
+    return UINT32LE.pack(int(more) | len(data) << 1 | chunk_type << 25) + data
+
+
+def build_bank(samples, version: int = 1) -> bytes:
+    """MPEG soundbank, second sample carries loop and frequency chunks"""
+    datas = [data + b'\0' * (-len(data) % 16) for data in samples.values()]
+    headers = b''
+    offset = 0
+    for idx, data in enumerate(datas):
+        chunks = b''
+        if idx == 1:
+            chunks = metadata_chunk(3, UINT32LE.pack(0) * 2, True)
+            chunks += metadata_chunk(2, UINT32LE.pack(44100), False)
+        # next chunk flag, frequency index 8 (44100), stereo, offset in 16 bytes
+        raw = bool(chunks) | 8 << 1 | 1 << 5 | (offset // 16) << 6 | 1000 << 34
+        headers += UINT64LE.pack(raw) + chunks
+        offset += len(data)
+    names = b''.join(name.encode() + b'\0' for name in samples)
+    starts = [0]
+    for name in samples:
+        starts.append(starts[-1] + len(name) + 1)
+    table = b''.join(UINT32LE.pack(4 * len(samples) + start) for start in starts[:-1])
+    table += names + b'\0' * (-(len(table) + len(names)) % 16)
+    data = b''.join(datas)
+    header = FSB5_HEADER.pack(
+        b'FSB5',
+        version,
+        len(samples),
+        len(headers),
+        len(table),
+        len(data),
+        MODE_MPEG,
+        bytes(8),
+        bytes(16),
+        bytes(8),
+    )
+    if version == 0:
+        header += UINT32LE.pack(0)
+    return header + headers + table + data
+
+
+def rebuilt_samples(bank: bytes):
+    parsed = fsb5.FSB5(bank)
+    return {sample.name: parsed.rebuild_sample(sample) for sample in parsed.samples}
+
+
+@pytest.mark.parametrize('version', [0, 1])
+def test_ranges_match_fsb5(version) -> None:
+    bank = build_bank(SAMPLES, version)
+    ranges = dict(read_sample_ranges(io.BytesIO(bank)))
+    expected = rebuilt_samples(bank)
+    assert list(ranges) == list(expected) == list(SAMPLES)
+    for name, sample in ranges.items():
+        assert bank[sample.offset : sample.offset + sample.size] == expected[name]
+
+
+@pytest.mark.parametrize('mapped', [False, True])
+@pytest.mark.parametrize('spooled', [False, True])
+def test_copied_samples_match_fsb5(tmp_path, monkeypatch, mapped, spooled) -> None:
+    if mapped:
+        monkeypatch.delattr(os, 'copy_file_range', raising=False)
+    # bank is stored past start of archive, like a member of LPAK file
+    base = 3 * 4096 + 5
+    bank = build_bank(SAMPLES)
+    (tmp_path / 'archive').write_bytes(b'\x01' * base + bank + b'\x02' * 7)
+    ranges = list(read_sample_ranges(io.BytesIO(bank)))
+    expected = rebuilt_samples(bank)
+
+    output = (
+        tempfile.SpooledTemporaryFile(max_size=1 << 20)
+        if spooled
+        else open(tmp_path / 'output', 'w+b')
+    )
+    with open(tmp_path / 'archive', 'rb') as source, output:
+        for name, sample in ranges:
+            # tags are written through the buffer between copied samples
+            output.write(name.encode())
+            copy_file_range(source, output, base + sample.offset, sample.size)
+        output.seek(0)
+        assert output.read() == b''.join(
+            name.encode() + expected[name] for name, _ in ranges
+        )